@@ -3,6 +3,7 @@ from tortoise import exceptions
 from tortoise.transactions import atomic
 
 from infrastructure.database.models import (SystemUser,
+                                            SystemUserSession,
                                             Role,
                                             Zone,
                                             AbstractBaseModel,
@@ -15,9 +16,14 @@ from infrastructure.database.models import (SystemUser,
                                             Parking)
 
 from application.access.base_access import BaseAccess
+from application.service.parking import parking_availability
+from application.service.pass_index import pass_index
+from application.service.recipients import recipients
 from core.dto import access
 from core.dto.access import EntityId
+from core.server.auth import Auth, ScopeRegistry
 from core.utils.crypto import BaseCrypto
+from core.utils.executor import crypto_executor
 from infrastructure.database.repository import EntityRepository
 from application.exceptions import InconsistencyError
 
@@ -29,7 +35,8 @@ class SystemUserAccess(BaseAccess):
     async def create(self, alter_user: EntityId, dto: access.SystemUser.CreationDto) -> SystemUser:
         await EntityRepository.check_exist(SystemUser, username=dto.username)
 
-        crypted_password, salt = BaseCrypto.encrypt_password(dto.password)
+        crypted_password, salt = await crypto_executor.run("encrypt_password", BaseCrypto.encrypt_password,
+                                                           dto.password)
 
         try:
             system_user = await SystemUser.create(first_name=dto.first_name,
@@ -43,6 +50,7 @@ class SystemUserAccess(BaseAccess):
             roles = await Role.filter(id__in=dto.scopes)
             for role in roles:
                 await system_user.scopes.add(role)
+            recipients.invalidate_roles()
 
             return system_user
 
@@ -51,14 +59,27 @@ class SystemUserAccess(BaseAccess):
         except Exception as exx:
             raise InconsistencyError(message=f"{exx}.")
 
-    @atomic()
     async def update(self, alter_user: EntityId, entity_id: EntityId, dto: access.SystemUser.UpdateDto) -> EntityId:
+        await self._update(alter_user, entity_id, dto)
+        Auth.invalidate_user_sessions(entity_id)
+        recipients.invalidate_users()
+        return entity_id
+
+    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+        await self._delete(alter_user, entity_id)
+        Auth.invalidate_user_sessions(entity_id)
+        recipients.invalidate_users()
+        return entity_id
+
+    @atomic()
+    async def _update(self, alter_user: EntityId, entity_id: EntityId, dto: access.SystemUser.UpdateDto) -> EntityId:
         await EntityRepository.check_not_exist_or_delete(SystemUser, entity_id)
 
         crypted_password = salt = None
 
         if dto.password:
-            crypted_password, salt = BaseCrypto.encrypt_password(dto.password)
+            crypted_password, salt = await crypto_executor.run("encrypt_password", BaseCrypto.encrypt_password,
+                                                               dto.password)
 
         system_user = await SystemUser.get_or_none(id=entity_id)
         try:
@@ -75,8 +96,11 @@ class SystemUserAccess(BaseAccess):
                 roles = await Role.filter(id__in=dto.scopes)
                 for role in roles:
                     await system_user.scopes.add(role)
+            role_ids = await system_user.scopes.all().values_list("id", flat=True)
+            await SystemUserSession.filter(user_id=entity_id).update(scopes_mask=ScopeRegistry.mask_of_ids(role_ids))
 
             await system_user.save()
+            await Auth.sessions_changed()
             return entity_id
 
         except exceptions.ValidationError as ex:
@@ -85,9 +109,10 @@ class SystemUserAccess(BaseAccess):
             raise InconsistencyError(message=f"There is a problem updating user with id = {entity_id}.")
 
     @atomic()
-    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+    async def _delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
         await EntityRepository.check_not_exist_or_delete(SystemUser, entity_id)
         await SystemUser.filter(id=entity_id).update(deleted=True)
+        await Auth.sessions_changed()
         return entity_id
 
 
@@ -156,6 +181,7 @@ class ClaimWayAccess(BaseAccess):
                 raise InconsistencyError(message=f"ClaimWay with id={entity_id} does not exist.")
 
             await self.add_roles_and_users(claim_way, dto)
+            recipients.invalidate_claim_way(entity_id)
 
             return entity_id
         except Exception as ex:
@@ -169,6 +195,7 @@ class ClaimWayAccess(BaseAccess):
                 raise InconsistencyError(message=f"ClaimWay with id={entity_id} does not exist.")
 
             await claim_way.delete()
+            recipients.invalidate_claim_way(entity_id)
             return entity_id
 
         except Exception as ex:
@@ -178,8 +205,23 @@ class ClaimWayAccess(BaseAccess):
 class ClaimToZoneAccess(BaseAccess):
     target_model = ClaimToZone
 
-    @atomic()
     async def create(self, alter_user: EntityId, dto: access.ClaimToZone.CreationDto) -> ClaimToZone:
+        claim_to_zone = await self._create(alter_user, dto)
+        await pass_index.refresh_changes(links=(claim_to_zone.id,))
+        return claim_to_zone
+
+    async def update(self, alter_user: EntityId, entity_id: EntityId, dto: access.ClaimToZone.UpdateDto) -> EntityId:
+        await self._update(alter_user, entity_id, dto)
+        await pass_index.refresh_changes(links=(entity_id,))
+        return entity_id
+
+    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+        await self._delete(alter_user, entity_id)
+        await pass_index.refresh_changes(links=(entity_id,))
+        return entity_id
+
+    @atomic()
+    async def _create(self, alter_user: EntityId, dto: access.ClaimToZone.CreationDto) -> ClaimToZone:
         try:
             claim = await Claim.get_or_none(id=dto.claim)
 
@@ -203,7 +245,7 @@ class ClaimToZoneAccess(BaseAccess):
             raise InconsistencyError(message=f"{ex}.")
 
     @atomic()
-    async def update(self, alter_user: EntityId, entity_id: EntityId, dto: access.ClaimToZone.UpdateDto) -> EntityId:
+    async def _update(self, alter_user: EntityId, entity_id: EntityId, dto: access.ClaimToZone.UpdateDto) -> EntityId:
         try:
             claimtozone_exist = await ClaimToZone.exists(id=entity_id)
             if claimtozone_exist is None:
@@ -235,7 +277,7 @@ class ClaimToZoneAccess(BaseAccess):
             raise InconsistencyError(message=f"{ex}")
 
     @atomic()
-    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+    async def _delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
         claim_to_zone = await ClaimToZone.get_or_none(id=entity_id)
         if claim_to_zone is None:
             raise InconsistencyError(message=f"ClaimToZone with id={entity_id} does not exist.")
@@ -246,8 +288,23 @@ class ClaimToZoneAccess(BaseAccess):
 class ParkingPlaceAccess(BaseAccess):
     target_model = ParkingPlace
 
-    @atomic()
     async def create(self, alter_user: EntityId, dto: access.ParkingPlace.CreationDto) -> ParkingPlace:
+        parking_place = await self._create(alter_user, dto)
+        await parking_availability.refresh_places((parking_place.id,))
+        return parking_place
+
+    async def update(self, alter_user: EntityId, entity_id: EntityId, dto: access.ParkingPlace.UpdateDto) -> EntityId:
+        await self._update(alter_user, entity_id, dto)
+        await parking_availability.refresh_places((entity_id,))
+        return entity_id
+
+    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+        await self._delete(alter_user, entity_id)
+        await parking_availability.refresh_places((entity_id,))
+        return entity_id
+
+    @atomic()
+    async def _create(self, alter_user: EntityId, dto: access.ParkingPlace.CreationDto) -> ParkingPlace:
         try:
             acquire_parking_intervals = await AcquireParkingInterval.get_or_none(id=dto.acquire_parking_intervals)
             if acquire_parking_intervals is None:
@@ -261,7 +318,7 @@ class ParkingPlaceAccess(BaseAccess):
             raise InconsistencyError(message=f"{ex}.")
 
     @atomic()
-    async def update(self,
+    async def _update(self,
                      alter_user: EntityId,
                      entity_id: EntityId,
                      dto: access.ParkingPlace.UpdateDto) -> EntityId:
@@ -288,7 +345,7 @@ class ParkingPlaceAccess(BaseAccess):
             raise InconsistencyError(message=f"{ex}")
 
     @atomic()
-    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+    async def _delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
         parking_place = await ParkingPlace.get_or_none(id=entity_id)
         if parking_place is None:
             raise InconsistencyError(message=f"ParkingPlace with id={entity_id} does not exist.")
@@ -348,26 +405,51 @@ class ParkingAccess(BaseAccess):
 class RoleAccess(BaseAccess):
     target_model = Role
 
-    @atomic()
     async def create(self, alter_user: EntityId, dto: access.Role.CreationDto) -> AbstractBaseModel:
-        return await super().create(alter_user, dto)
+        role = await self._create(alter_user, dto)
+        Auth.expire_roles()
+        recipients.invalidate_roles()
+        return role
 
-    @atomic()
     async def update(self, alter_user: EntityId, entity_id: EntityId, dto: access.Role.UpdateDto) -> EntityId:
+        await self._update(alter_user, entity_id, dto)
+        Auth.expire_roles()
+        recipients.invalidate_roles()
+        return entity_id
+
+    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+        await self._delete(alter_user, entity_id)
+        Auth.expire_roles()
+        recipients.invalidate_roles()
+        return entity_id
+
+    @atomic()
+    async def _create(self, alter_user: EntityId, dto: access.Role.CreationDto) -> AbstractBaseModel:
+        role = await super().create(alter_user, dto)
+        await Auth.roles_changed()
+        return role
+
+    @atomic()
+    async def _update(self, alter_user: EntityId, entity_id: EntityId, dto: access.Role.UpdateDto) -> EntityId:
         role = await Role.get_or_none(id=entity_id)
         if role is None:
             raise InconsistencyError(message=f"Role with id={entity_id} does not exist")
 
         role.name = dto.name
         await role.save()
+        await Auth.roles_changed()
 
         return entity_id
 
     @atomic()
-    async def delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
+    async def _delete(self, alter_user: EntityId, entity_id: EntityId) -> EntityId:
         role = await Role.get_or_none(id=entity_id)
         if role is None:
             raise InconsistencyError(message=f"Role with id={entity_id} does not exist.")
 
+        user_ids = await SystemUser.filter(scopes__id=entity_id).values_list("id", flat=True)
         await role.delete()
+        # masks of the holders are recomputed from their remaining roles when their sessions are verified
+        await SystemUserSession.filter(user_id__in=user_ids).update(scopes_mask=0)
+        await Auth.roles_changed()
         return entity_id
@@ -1,4 +1,4 @@
-from typing import Union, Type, List
+from typing import Union, Type, List, Sequence
 from pydantic import BaseModel
 from tortoise.transactions import atomic
 from tortoise.exceptions import IntegrityError
@@ -25,16 +25,21 @@ class BaseAccess:
             integrity_error_format(exception)
         return entity
 
-    async def read(self, _id: EntityId) -> AbstractBaseModel:
-        related_fields = await DbLayer.extract_relatable_fields(self.target_model)
-        return await self.target_model.get_or_none(id=_id).prefetch_related(*related_fields)
+    async def read(self, _id: EntityId, columns: Sequence[str] = None) -> AbstractBaseModel:
+        query = self.target_model.filter(id=_id).using_db(DbLayer.read_connection())
+        return await (await DbLayer.project(query, self.target_model, columns)).first()
 
     async def read_all(self,
                        limit: int = None,
-                       offset: int = None) -> Union[List[AbstractBaseModel],
-                                                    AbstractBaseModel]:
-        related_fields = await DbLayer.extract_relatable_fields(self.target_model)
-        query = self.target_model.all().prefetch_related(*related_fields)
+                       offset: int = None,
+                       after_id: int = None,
+                       columns: Sequence[str] = None) -> Union[List[AbstractBaseModel],
+                                                                AbstractBaseModel]:
+        query = self.target_model.all().using_db(DbLayer.read_connection())
+        query = await DbLayer.project(query, self.target_model, columns)
+        query = query.order_by("id")
+        if after_id is not None:
+            query = query.filter(id__gt=after_id)
         if limit:
             query = query.limit(limit)
         if offset:
@@ -4,9 +4,11 @@ import settings
 from core.dto.access import EntityId
 from core.dto.service import BlackListDto, EmailStruct
 from core.communication.event import NotifyVisitorInBlackListEvent
-from infrastructure.database.models import BlackList, AbstractBaseModel, Visitor, SystemUser
+from infrastructure.database.models import BlackList, AbstractBaseModel, Visitor
 from application.exceptions import InconsistencyError
 from application.service.base_service import BaseService
+from application.service.black_list_index import black_list_index
+from application.service.recipients import recipients
 
 
 class BlackListService(BaseService):
@@ -14,26 +16,33 @@ class BlackListService(BaseService):
 
     @staticmethod
     async def collect_target_users(visitor: Visitor) -> EmailStruct:
+        security_officers = await recipients.role_members(settings.SECURITY_OFFICER_ROLE)
+        about = f"{settings.BLACKLIST_NOTIFICATION_BODY_TEXT} " \
+                f"ID={visitor.id}: {visitor.first_name} {visitor.last_name}"
 
-        security_officers = await SystemUser.filter(scopes=5)  # Role.get(id=5) == 'security_officer'
-
-        emails = list()
-        texts = list()
-        for user in security_officers:
-            text = f"Hello, {user.first_name.title()}!\n " \
-                   f"{settings.BLACKLIST_NOTIFICATION_BODY_TEXT} " \
-                   f"ID={visitor.id}: {visitor.first_name} {visitor.last_name}"
-            emails.append(user.email)
-            texts.append(text)
-
-        email_struct = EmailStruct(email=emails,
-                                   text=texts,
+        email_struct = EmailStruct(email=[email for email, _ in security_officers],
+                                   text=[greeting + about for _, greeting in security_officers],
                                    subject=settings.BLACKLIST_NOTIFICATION_SUBJECT_TEXT)
 
         return email_struct
 
-    @atomic()
     async def create(self, system_user: EntityId, dto: BlackListDto.CreationDto) -> AbstractBaseModel:
+        black_list = await self._create(system_user, dto)
+        await black_list_index.refresh_entry(black_list.id)
+        return black_list
+
+    async def update(self, system_user: EntityId, entity_id: EntityId, dto: BlackListDto.UpdateDto) -> BlackList:
+        black_list = await self._update(system_user, entity_id, dto)
+        await black_list_index.refresh_entry(black_list.id)
+        return black_list
+
+    async def delete(self, system_user: EntityId, entity_id: EntityId) -> EntityId:
+        await self._delete(system_user, entity_id)
+        black_list_index.remove_entry(entity_id)
+        return entity_id
+
+    @atomic()
+    async def _create(self, system_user: EntityId, dto: BlackListDto.CreationDto) -> AbstractBaseModel:
         visitor = await Visitor.get_or_none(id=dto.visitor)
         if visitor is None:
             raise InconsistencyError(message=f"Visitor with id={dto.visitor} does not exist."
@@ -41,13 +50,14 @@ class BlackListService(BaseService):
 
         black_list = await BlackList.create(visitor=visitor,
                                             level=dto.level)
+        await black_list_index.entries_changed()
 
-        self.notify(NotifyVisitorInBlackListEvent(await self.collect_target_users(visitor)))
+        await self.notify(NotifyVisitorInBlackListEvent(await self.collect_target_users(visitor)))
 
         return black_list
 
     @atomic()
-    async def update(self, system_user: EntityId, entity_id: EntityId, dto: BlackListDto.UpdateDto) -> BlackList:
+    async def _update(self, system_user: EntityId, entity_id: EntityId, dto: BlackListDto.UpdateDto) -> BlackList:
         black_list = await BlackList.get_or_none(id=entity_id).prefetch_related('visitor')
         if black_list is None:
             raise InconsistencyError(message=f"BlackList with id={entity_id} does not exist.")
@@ -60,18 +70,20 @@ class BlackListService(BaseService):
         black_list.level = dto.level or black_list.level
 
         await black_list.save()
-        self.notify(NotifyVisitorInBlackListEvent(await self.collect_target_users(visitor)))
+        await black_list_index.entries_changed()
+        await self.notify(NotifyVisitorInBlackListEvent(await self.collect_target_users(visitor)))
 
         return black_list
 
     @atomic()
-    async def delete(self, system_user: EntityId, entity_id: EntityId) -> EntityId:
+    async def _delete(self, system_user: EntityId, entity_id: EntityId) -> EntityId:
         black_list = await BlackList.get_or_none(id=entity_id).prefetch_related("visitor")
         if black_list is None:
             raise InconsistencyError(message=f"BlackList with id={entity_id} does not exist.")
 
         visitor = black_list.visitor
-        self.notify(NotifyVisitorInBlackListEvent(await self.collect_target_users(visitor)))
+        await self.notify(NotifyVisitorInBlackListEvent(await self.collect_target_users(visitor)))
 
         await black_list.delete()
+        await black_list_index.entries_changed()
         return entity_id
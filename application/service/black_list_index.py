@@ -0,0 +1,158 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+import settings
+from infrastructure.database.models import BlackList, Visitor
+from infrastructure.database.versions import VersionStamp
+
+# Cyrillic letters used in Russian plates and document series, mapped to their Latin twins
+_LOOKALIKES = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+DOCUMENT_KINDS = ("passport", "drive_license", "military_id", "transport")
+_DOCUMENT_FIELDS = {
+    "passport": "passport__number",
+    "drive_license": "drive_license__number",
+    "military_id": "military_id__number",
+    "transport": "transport__number",
+}
+
+DocumentKey = Tuple[str, str]
+
+
+def normalize(value) -> Optional[str]:
+    """Document number or plate without spaces and dashes, upper case, lookalike letters in Latin"""
+    if value is None:
+        return None
+    normalized = "".join(ch for ch in str(value).upper() if ch.isalnum()).translate(_LOOKALIKES)
+    return normalized or None
+
+
+def document_keys(documents: dict) -> List[DocumentKey]:
+    """Keys of the index for {kind: number} pairs, kinds are DOCUMENT_KINDS"""
+    keys = []
+    for kind in DOCUMENT_KINDS:
+        number = normalize(documents.get(kind))
+        if number is not None:
+            keys.append((kind, number))
+    return keys
+
+
+class BlackListIndex:
+    """
+    Blacklisted visitors of the worker kept in memory: by visitor id and by normalized numbers
+    of their passport, drive license, military id and transport plate.
+    BlackListService updates it after its transactions commit and bumps the "blacklist" version row in them,
+    so other workers reload before screening once the change is visible. A full reload every
+    settings.BLACKLIST_INDEX_REFRESH_INTERVAL seconds picks up changes of visitor documents.
+    """
+
+    def __init__(self, refresh_interval: float, max_age: float):
+        self.refresh_interval = refresh_interval
+        self._version = VersionStamp("blacklist", max_age)
+        self._entries: Dict[int, Tuple[int, Tuple[DocumentKey, ...]]] = {}
+        self._visitors: Dict[int, Set[int]] = {}
+        self._documents: Dict[DocumentKey, Set[int]] = {}
+        self._loaded = False
+        self._watcher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def _fetch(**filters) -> List[dict]:
+        fields = ["id", "visitor_id"] + [f"visitor__{field}" for field in _DOCUMENT_FIELDS.values()]
+        rows = await BlackList.filter(**filters).values(*fields)
+        return [{"id": row["id"], "visitor_id": row["visitor_id"],
+                 **{kind: row[f"visitor__{field}"] for kind, field in _DOCUMENT_FIELDS.items()}}
+                for row in rows]
+
+    def _add(self, row: dict) -> None:
+        keys = tuple(document_keys(row))
+        self._entries[row["id"]] = (row["visitor_id"], keys)
+        self._visitors.setdefault(row["visitor_id"], set()).add(row["id"])
+        for key in keys:
+            self._documents.setdefault(key, set()).add(row["id"])
+
+    def _remove(self, black_list_id: int) -> None:
+        entry = self._entries.pop(black_list_id, None)
+        if entry is None:
+            return
+        visitor_id, keys = entry
+        for bucket, key in [(self._visitors, visitor_id)] + [(self._documents, key) for key in keys]:
+            ids = bucket.get(key)
+            if ids is not None:
+                ids.discard(black_list_id)
+                if not ids:
+                    del bucket[key]
+
+    async def load(self) -> None:
+        await self._version.sync()
+        rows = await self._fetch()
+        self._entries, self._visitors, self._documents = {}, {}, {}
+        for row in rows:
+            self._add(row)
+        self._loaded = True
+
+    async def ensure_fresh(self) -> None:
+        """Load the index, or reload it if another worker changed the blacklist"""
+        if not self._loaded or await self._version.changed():
+            await self.load()
+
+    async def entries_changed(self) -> None:
+        """Call in the transaction that changes the blacklist"""
+        await self._version.bump()
+
+    async def refresh_entry(self, black_list_id: int) -> None:
+        """Reread one blacklist entry, removes it from the index if it no longer exists"""
+        self._remove(black_list_id)
+        for row in await self._fetch(id=black_list_id):
+            self._add(row)
+
+    def remove_entry(self, black_list_id: int) -> None:
+        self._remove(black_list_id)
+
+    def screen(self, visitor_id: Optional[int] = None, **documents) -> List[str]:
+        """Reasons the visitor is blacklisted: "visitor" and/or document kinds, empty list if clean"""
+        matches = []
+        if visitor_id is not None and visitor_id in self._visitors:
+            matches.append("visitor")
+        for kind, number in document_keys(documents):
+            if (kind, number) in self._documents:
+                matches.append(kind)
+        return matches
+
+    async def screen_visitor(self, visitor: Visitor, documents: dict) -> List[str]:
+        """Screen a visitor by id and by the document models VisitorService is about to attach"""
+        await self.ensure_fresh()
+        numbers = {kind: getattr(documents.get(kind), "number", None) for kind in DOCUMENT_KINDS}
+        return self.screen(visitor.id, **numbers)
+
+    async def screen_many(self, items: Iterable[dict]) -> List[List[str]]:
+        await self.ensure_fresh()
+        return [self.screen(item.get("visitor"), **item) for item in items]
+
+    async def claim_visitors(self, claim_id: int) -> List[dict]:
+        """Visitors of a claim in screen_many format, one query"""
+        fields = ["id"] + list(_DOCUMENT_FIELDS.values())
+        rows = await Visitor.filter(claim_id=claim_id, deleted=False).values(*fields)
+        return [{"visitor": row["id"], **{kind: row[field] for kind, field in _DOCUMENT_FIELDS.items()}}
+                for row in rows]
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Can't reload blacklist index. Exception: {e}")
+
+    async def start(self) -> None:
+        await self.load()
+        if self._watcher is None and self.refresh_interval > 0:
+            self._watcher = asyncio.get_running_loop().create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+black_list_index = BlackListIndex(settings.BLACKLIST_INDEX_REFRESH_INTERVAL, settings.SHARED_STATE_MAX_AGE)
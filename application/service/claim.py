@@ -1,6 +1,5 @@
 from tortoise.transactions import atomic
 
-import settings
 from infrastructure.database.models import (SystemUser,
                                             Claim,
                                             ClaimWay,
@@ -8,6 +7,8 @@ from infrastructure.database.models import (SystemUser,
                                             AbstractBaseModel)
 from application.exceptions import InconsistencyError
 from application.service.base_service import BaseService
+from application.service.pass_index import pass_index
+from application.service.recipients import recipients
 from core.dto.access import EntityId
 from core.dto.service import ClaimDto, EmailStruct
 from core.communication.event import NotifyUsersInClaimWayEvent
@@ -19,29 +20,14 @@ class ClaimService(BaseService):
 
     @staticmethod
     async def _collect_target_users(claim_way: ClaimWay) -> EmailStruct:
-        system_users = claim_way.__dict__.get('_system_users')
-
-        emails = list()
-        texts = list()
-        for user in system_users:
-            text = f"Hello, {user.first_name.title()}!\n " \
-                   f"{settings.CLAIMWAY_BODY_TEXT}"
-
-            emails.append(user.email)
-            texts.append(text)
-
-        email_struct = EmailStruct(email=emails,
-                                   text=texts,
-                                   subject=settings.CLAIMWAY_SUBJECT_TEXT)
-
-        return email_struct
+        return await recipients.claim_way_notification(claim_way)
 
     @atomic()
     # @AddPlugins()
     async def create(self, system_user: SystemUser, dto: ClaimDto.CreationDto) -> Claim:
         """Place Claim for visiting by specified visitor"""
         pass_id = await Pass.get_or_none(id=dto.pass_id)
-        claim_way = await ClaimWay.get_or_none(id=dto.claim_way).prefetch_related("system_users")
+        claim_way = await ClaimWay.get_or_none(id=dto.claim_way)
 
         claim = await Claim.create(pass_type=dto.pass_type,
                                    claim_way=claim_way,
@@ -49,17 +35,27 @@ class ClaimService(BaseService):
                                    information=dto.information,
                                    status=dto.status)
         if claim_way is not None:
-            self.notify(NotifyUsersInClaimWayEvent(await self._collect_target_users(claim_way)))
+            await self.notify(NotifyUsersInClaimWayEvent(await self._collect_target_users(claim_way)))
 
         return claim
 
-    @atomic()
     async def update(self, system_user: SystemUser, entity_id: EntityId, dto: ClaimDto.UpdateDto) -> AbstractBaseModel:
+        claim = await self._update(system_user, entity_id, dto)
+        await pass_index.refresh_changes(claims=(entity_id,))
+        return claim
+
+    async def delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
+        await self._delete(system_user, entity_id)
+        await pass_index.refresh_changes(claims=(entity_id,))
+        return entity_id
+
+    @atomic()
+    async def _update(self, system_user: SystemUser, entity_id: EntityId, dto: ClaimDto.UpdateDto) -> AbstractBaseModel:
         claim = await self.read(entity_id)
         if claim is None:
             raise InconsistencyError(message=f"Claim with id={entity_id} does not exist.")
 
-        claim_way = await ClaimWay.get_or_none(id=dto.claim_way).prefetch_related("system_users")
+        claim_way = await ClaimWay.get_or_none(id=dto.claim_way)
         pass_id = await Pass.get_or_none(id=dto.pass_id)
 
         if dto.is_in_blacklist is not None:
@@ -85,17 +81,16 @@ class ClaimService(BaseService):
         if dto.approved or dto.status:
             # If changing sensitive fields notify related users in ClaimWay
             if claim.claim_way is not None:
-                claim_way = await ClaimWay.get_or_none(id=claim.claim_way).prefetch_related("system_users")
-                self.notify(NotifyUsersInClaimWayEvent(await self._collect_target_users(claim_way)))
+                await self.notify(NotifyUsersInClaimWayEvent(await self._collect_target_users(claim.claim_way)))
 
         if claim_way is not None:
-            self.notify(NotifyUsersInClaimWayEvent(await self._collect_target_users(claim_way)))
+            await self.notify(NotifyUsersInClaimWayEvent(await self._collect_target_users(claim_way)))
 
         await claim.save()
         return claim
 
     @atomic()
-    async def delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
+    async def _delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
         claim = await Claim.get_or_none(id=entity_id)
         if claim is None:
             raise InconsistencyError(message=f"Claim with id={entity_id} does not exist.")
@@ -0,0 +1,99 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Type
+
+from core.utils.serialization import dumps
+from infrastructure.database.layer import DbLayer
+from infrastructure.database.models import AbstractBaseModel, BlackList, Claim, VisitSession
+from infrastructure.database.serializers import DATETIME_FORMAT
+
+
+class Export(NamedTuple):
+    model: Type[AbstractBaseModel]
+    # rows are filtered by this field
+    date_field: str
+    # output column -> field of values(), relations are joined
+    columns: Dict[str, str]
+
+
+EXPORTS: Dict[str, Export] = {
+    "visitsessions": Export(VisitSession, "enter", {
+        "id": "id",
+        "visitor": "visitor_id",
+        "first_name": "visitor__first_name",
+        "last_name": "visitor__last_name",
+        "middle_name": "visitor__middle_name",
+        "claim": "visitor__claim_id",
+        "enter": "enter",
+        "exit": "exit",
+    }),
+    "claims": Export(Claim, "created_at", {
+        "id": "id",
+        "claim_way": "claim_way_id",
+        "pass_id": "pass_id_id",
+        "pass_type": "pass_type",
+        "approved": "approved",
+        "is_in_blacklist": "is_in_blacklist",
+        "pnd_agreement": "pnd_agreement",
+        "information": "information",
+        "status": "status",
+        "created_at": "created_at",
+    }),
+    "blacklist": Export(BlackList, "created_at", {
+        "id": "id",
+        "visitor": "visitor_id",
+        "first_name": "visitor__first_name",
+        "last_name": "visitor__last_name",
+        "middle_name": "visitor__middle_name",
+        "level": "level",
+    }),
+}
+
+
+async def iterate_rows(export: Export, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       chunk_size: int = 1000) -> AsyncIterator[List[dict]]:
+    """
+    Rows in id order, chunk_size rows per query. Every query continues after the last id of the previous one,
+    so memory does not depend on the number of rows and no query scans the rows already exported.
+    """
+    filters = {}
+    if start is not None:
+        filters[f"{export.date_field}__gte"] = start
+    if end is not None:
+        filters[f"{export.date_field}__lt"] = end
+    last_id = 0
+    while True:
+        rows = await export.model.filter(id__gt=last_id, **filters).order_by("id").limit(chunk_size) \
+            .using_db(DbLayer.read_connection()).values(**export.columns)
+        if not rows:
+            return
+        for row in rows:
+            for column, value in row.items():
+                if isinstance(value, datetime):
+                    row[column] = value.astimezone().strftime(DATETIME_FORMAT)
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def to_ndjson(rows: List[dict]) -> bytes:
+    lines = [dumps(row) for row in rows]
+    if lines and isinstance(lines[0], str):
+        return ("\n".join(lines) + "\n").encode()
+    return b"\n".join(lines) + b"\n"
+
+
+def to_csv(rows: List[list]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def csv_header(export: Export) -> bytes:
+    return to_csv([list(export.columns)])
+
+
+def csv_rows(rows: List[dict]) -> bytes:
+    return to_csv([list(row.values()) for row in rows])
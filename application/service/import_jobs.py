@@ -0,0 +1,127 @@
+import asyncio
+import csv
+import os
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+import settings
+from application.service.visitor_import import READERS, next_chunk
+from core.utils.metrics import metrics
+from infrastructure.database.models import VisitorImport
+
+
+class VisitorImportJobs:
+    """
+    Visitor list imports running in the background of the worker that received the file, at most
+    `concurrency` at a time. The file is read row by row and imported in chunks of `chunk_size` rows,
+    every chunk in its own transaction. Progress is saved to VisitorImport after every chunk, so any worker
+    can report it. Rows that were not imported are written to <dirname>/<id>.errors.csv, which is removed
+    `errors_max_age` seconds after the import finished.
+    """
+
+    def __init__(self, dirname: str, chunk_size: int, concurrency: int, errors_max_age: float):
+        self.dirname = dirname
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.errors_max_age = errors_max_age
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def upload_path(self, job: VisitorImport) -> str:
+        os.makedirs(self.dirname, exist_ok=True)
+        return os.path.join(self.dirname, f"{job.id}.{job.file_format}")
+
+    def errors_path(self, job_id: int) -> str:
+        return os.path.join(self.dirname, f"{job_id}.errors.csv")
+
+    def remove_expired(self) -> None:
+        """Remove error files older than errors_max_age"""
+        if not os.path.isdir(self.dirname):
+            return
+        expired = time.time() - self.errors_max_age
+        for entry in os.scandir(self.dirname):
+            if entry.name.endswith(".errors.csv") and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+
+    async def recover(self) -> None:
+        """
+        Fail the jobs a previous run of the server left pending or running and remove their uploads.
+        Runs once in the main process before workers start, when no job can be running.
+        """
+        interrupted = await VisitorImport.filter(status__in=("pending", "running")) \
+            .values_list("id", "file_format")
+        if interrupted:
+            await VisitorImport.filter(id__in=[job_id for job_id, _ in interrupted]) \
+                .update(status="failed", error="Interrupted by server restart")
+            logger.warning(f"{len(interrupted)} visitor imports were interrupted by server restart")
+        for job_id, file_format in interrupted:
+            path = os.path.join(self.dirname, f"{job_id}.{file_format}")
+            if os.path.exists(path):
+                os.remove(path)
+        self.remove_expired()
+
+    def submit(self, job: VisitorImport, service) -> None:
+        """Import the uploaded file of the job with VisitorService.import_rows"""
+        self.remove_expired()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(self._run(job, service))
+
+    async def _run(self, job: VisitorImport, service) -> None:
+        path = self.upload_path(job)
+        loop = asyncio.get_running_loop()
+        processed = imported = failed = 0
+        rows = None
+        try:
+            async with self._semaphore:
+                await VisitorImport.filter(id=job.id).update(status="running")
+                rows = READERS[job.file_format](path)
+                with open(self.errors_path(job.id), "w", newline="", encoding="utf-8") as errors_file:
+                    errors = csv.writer(errors_file)
+                    errors.writerow(["row", "errors"])
+                    while True:
+                        # reading and validation are CPU bound, they run in a thread
+                        chunk = await loop.run_in_executor(None, next_chunk, rows, self.chunk_size, job.claim_id)
+                        if not chunk:
+                            break
+                        start = time.perf_counter()
+                        await service.import_rows(chunk)
+                        metrics.observe("visitor_import.chunk", time.perf_counter() - start)
+                        for row in chunk:
+                            if row.errors:
+                                errors.writerow([row.index, "; ".join(row.errors)])
+                        processed += len(chunk)
+                        imported += sum(row.visitor is not None for row in chunk)
+                        failed = processed - imported
+                        await VisitorImport.filter(id=job.id).update(processed=processed, imported=imported,
+                                                                     failed=failed)
+            await VisitorImport.filter(id=job.id).update(status="done")
+            metrics.increment("visitor_import.rows", processed)
+        except asyncio.CancelledError:
+            await VisitorImport.filter(id=job.id).update(status="failed", error="Interrupted by server shutdown")
+            raise
+        except Exception as e:
+            logger.error(f"Visitor import {job.id} failed. Exception: {e}")
+            await VisitorImport.filter(id=job.id).update(status="failed", error=str(e))
+        finally:
+            self._tasks.pop(job.id, None)
+            if rows is not None:
+                try:
+                    rows.close()
+                except ValueError:
+                    # cancelled while the thread reads the next chunk, the reader is closed when it is collected
+                    pass
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+visitor_imports = VisitorImportJobs(settings.VISITOR_IMPORT_DIRNAME, settings.VISITOR_IMPORT_CHUNK_SIZE,
+                                    settings.VISITOR_IMPORT_CONCURRENCY, settings.VISITOR_IMPORT_ERRORS_MAX_AGE)
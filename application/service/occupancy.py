@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import settings
+from core.utils.metrics import metrics
+from infrastructure.database.models import ClaimToZone, VisitSession
+
+
+class Occupancy:
+    """
+    Visitors on site right now, kept in memory by every worker: a visit session is open when it has
+    enter and no exit, its visitor counts in the zones of its claim.
+    VisitSessionService updates it after its transactions commit. Sessions changed by other workers are seen
+    by the next read after settings.OCCUPANCY_MAX_AGE seconds, it rereads the open sessions through
+    the partial index on them, so every worker reports counts at most max_age seconds old.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        # open session id -> (visitor id, zone ids)
+        self._sessions: Dict[int, Tuple[int, FrozenSet[int]]] = {}
+        # visitor id -> open sessions, zone id -> visitor id -> open sessions in the zone
+        self._visitors: Dict[int, int] = {}
+        self._zones: Dict[int, Dict[int, int]] = {}
+        self._snapshot: Optional[dict] = None
+        # time.monotonic() of the last load, reads wait for the reload of a stale state under the lock
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._visitors)
+
+    @staticmethod
+    async def _fetch(**filters) -> List[Tuple[int, int, FrozenSet[int]]]:
+        rows = await VisitSession.filter(enter__isnull=False, exit__isnull=True, visitor__deleted=False,
+                                         **filters).values("id", "visitor_id", "visitor__claim_id")
+        claim_ids = {row["visitor__claim_id"] for row in rows} - {None}
+        zones: Dict[int, Set[int]] = {}
+        if claim_ids:
+            for claim_id, zone_id in await ClaimToZone.filter(claim_id__in=claim_ids) \
+                    .values_list("claim_id", "zones__id"):
+                if zone_id is not None:
+                    zones.setdefault(claim_id, set()).add(zone_id)
+        return [(row["id"], row["visitor_id"], frozenset(zones.get(row["visitor__claim_id"], ())))
+                for row in rows]
+
+    @staticmethod
+    def _count(counter: Dict[int, int], key: int, delta: int) -> None:
+        value = counter.get(key, 0) + delta
+        if value > 0:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    def _add(self, session_id: int, visitor_id: int, zones: FrozenSet[int]) -> None:
+        self._sessions[session_id] = (visitor_id, zones)
+        self._count(self._visitors, visitor_id, 1)
+        for zone_id in zones:
+            self._count(self._zones.setdefault(zone_id, {}), visitor_id, 1)
+        self._snapshot = None
+
+    def _remove(self, session_id: int) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return
+        visitor_id, zones = entry
+        self._count(self._visitors, visitor_id, -1)
+        for zone_id in zones:
+            visitors = self._zones.get(zone_id, {})
+            self._count(visitors, visitor_id, -1)
+            if not visitors:
+                self._zones.pop(zone_id, None)
+        self._snapshot = None
+
+    async def load(self) -> None:
+        loaded_at = time.monotonic()
+        rows = await self._fetch()
+        self._sessions, self._visitors, self._zones = {}, {}, {}
+        for row in rows:
+            self._add(*row)
+        self._snapshot = None
+        self._loaded_at = loaded_at
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    async def ensure_fresh(self) -> None:
+        """Reload the open sessions if they were read more than max_age seconds ago"""
+        if self._is_fresh():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._is_fresh():
+                await self.load()
+
+    async def refresh_session(self, session_id: int) -> None:
+        """Reread one visit session, removes it if it is closed or no longer exists"""
+        self._remove(session_id)
+        for row in await self._fetch(id=session_id):
+            self._add(*row)
+
+    def remove_session(self, session_id: int) -> None:
+        self._remove(session_id)
+
+    def snapshot(self, zone_id: Optional[int] = None) -> dict:
+        """Site-wide or zone headcount with ids of the present visitors"""
+        if zone_id is not None:
+            visitors = self._zones.get(zone_id, {})
+            return {"zone": zone_id, "count": len(visitors), "visitors": list(visitors)}
+        if self._snapshot is None:
+            self._snapshot = {"count": len(self._visitors),
+                              "zones": {zone_id: len(visitors) for zone_id, visitors in self._zones.items()},
+                              "visitors": list(self._visitors)}
+        return self._snapshot
+
+    async def start(self) -> None:
+        await self.load()
+
+
+occupancy = Occupancy(settings.OCCUPANCY_MAX_AGE)
+metrics.register_gauge("occupancy.visitors", lambda: len(occupancy))
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from tortoise.transactions import atomic
+
+import settings
+from application.exceptions import InconsistencyError
+from core.utils.metrics import metrics
+from infrastructure.database.models import ParkingPlace, ParkingReservation
+
+# reservations of a place never overlap, so the intervals are kept sorted by start: (start, end, reservation id)
+Interval = Tuple[float, float, int]
+
+
+class PlaceSchedule:
+    """Reservations of one parking place, sorted and disjoint, so an overlap check is one bisect"""
+    __slots__ = ("real_number", "enable", "legacy", "intervals")
+
+    def __init__(self, real_number: int, enable: bool, legacy: Optional[Tuple[float, float]] = None):
+        self.real_number = real_number
+        self.enable = enable
+        # ParkingPlace.acquire_parking_intervals, the interval the place was bound to before reservations
+        self.legacy = legacy
+        self.intervals: List[Interval] = []
+
+    def overlaps(self, start: float, end: float) -> bool:
+        if self.legacy is not None and self.legacy[0] < end and start < self.legacy[1]:
+            return True
+        i = bisect_left(self.intervals, (end,))
+        return i > 0 and self.intervals[i - 1][1] > start
+
+    def add(self, interval: Interval) -> None:
+        insort(self.intervals, interval)
+
+    def discard(self, reservation_id: int) -> None:
+        self.intervals = [interval for interval in self.intervals if interval[2] != reservation_id]
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return None if value is None else value.timestamp()
+
+
+class ParkingAvailability:
+    """
+    Parking places with their reservations kept in memory by every worker, reservations that ended are not kept.
+    Free places are found in memory, reserve() then locks the places and rechecks them in the database,
+    so two workers can't reserve overlapping intervals. A full reload every
+    settings.PARKING_INDEX_RELOAD_INTERVAL seconds picks up reservations made by other workers.
+    """
+
+    def __init__(self, reload_interval: float):
+        self.reload_interval = reload_interval
+        self._places: Dict[int, PlaceSchedule] = {}
+        # reservation id -> place id
+        self._reservations: Dict[int, int] = {}
+        self._loaded = False
+        self._watcher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._reservations)
+
+    @staticmethod
+    async def _fetch(place_ids: Optional[Iterable[int]] = None) -> Tuple[list, list]:
+        places = ParkingPlace.all()
+        reservations = ParkingReservation.filter(end__gt=datetime.now())
+        if place_ids is not None:
+            places = places.filter(id__in=place_ids)
+            reservations = reservations.filter(parking_place_id__in=place_ids)
+        place_rows = await places.values("id", "real_number", "enable",
+                                         "acquire_parking_intervals__start_interval",
+                                         "acquire_parking_intervals__end_interval")
+        reservation_rows = await reservations.values("id", "parking_place_id", "start", "end")
+        return place_rows, reservation_rows
+
+    def _apply(self, place_rows: Iterable[dict], reservation_rows: Iterable[dict]) -> None:
+        for row in place_rows:
+            start = _timestamp(row["acquire_parking_intervals__start_interval"])
+            end = _timestamp(row["acquire_parking_intervals__end_interval"])
+            legacy = (start, end) if start is not None and end is not None else None
+            self._places[row["id"]] = PlaceSchedule(row["real_number"], row["enable"], legacy)
+        for row in reservation_rows:
+            self._add(row["id"], row["parking_place_id"], row["start"].timestamp(), row["end"].timestamp())
+
+    def _add(self, reservation_id: int, place_id: int, start: float, end: float) -> None:
+        place = self._places.get(place_id)
+        if place is not None:
+            place.add((start, end, reservation_id))
+            self._reservations[reservation_id] = place_id
+
+    def _discard(self, reservation_id: int) -> None:
+        place_id = self._reservations.pop(reservation_id, None)
+        if place_id is not None and place_id in self._places:
+            self._places[place_id].discard(reservation_id)
+
+    async def load(self) -> None:
+        place_rows, reservation_rows = await self._fetch()
+        self._places, self._reservations = {}, {}
+        self._apply(place_rows, reservation_rows)
+        self._loaded = True
+
+    async def ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.load()
+
+    async def refresh_places(self, place_ids: Iterable[int]) -> None:
+        """Reread the places and their reservations, places that no longer exist are removed"""
+        place_ids = set(place_ids)
+        if not place_ids:
+            return
+        place_rows, reservation_rows = await self._fetch(place_ids)
+        for place_id in place_ids:
+            place = self._places.pop(place_id, None)
+            for _, _, reservation_id in place.intervals if place is not None else ():
+                self._reservations.pop(reservation_id, None)
+        self._apply(place_rows, reservation_rows)
+
+    def is_free(self, place_id: int, start: datetime, end: datetime) -> bool:
+        place = self._places.get(place_id)
+        return place is not None and place.enable and not place.overlaps(start.timestamp(), end.timestamp())
+
+    def free_places(self, start: datetime, end: datetime, count: Optional[int] = None,
+                    exclude: Iterable[int] = ()) -> List[int]:
+        """Ids of enabled places free for the whole interval, ordered by place number, at most count"""
+        start_ts, end_ts, exclude = start.timestamp(), end.timestamp(), set(exclude)
+        free = []
+        for place_id, place in sorted(self._places.items(), key=lambda item: (item[1].real_number, item[0])):
+            if place.enable and place_id not in exclude and not place.overlaps(start_ts, end_ts):
+                free.append(place_id)
+                if count is not None and len(free) == count:
+                    break
+        return free
+
+    @atomic()
+    async def _reserve(self, place_ids: List[int], start: datetime, end: datetime,
+                       transport_id: Optional[int]) -> Tuple[List[ParkingReservation], Set[int]]:
+        """Reservations for every place, or no reservations and the places that are taken or disabled"""
+        places = await ParkingPlace.filter(id__in=place_ids).order_by("id").select_for_update()
+        unavailable = set(place_ids) - {place.id for place in places if place.enable}
+        unavailable.update(await ParkingReservation.filter(parking_place_id__in=place_ids, start__lt=end,
+                                                           end__gt=start).values_list("parking_place_id", flat=True))
+        unavailable.update(await ParkingPlace.filter(id__in=place_ids, acquire_parking_intervals__start_interval__lt=end,
+                                                     acquire_parking_intervals__end_interval__gt=start)
+                           .values_list("id", flat=True))
+        if unavailable:
+            return [], unavailable
+        reservations = []
+        for place_id in place_ids:
+            reservations.append(await ParkingReservation.create(parking_place_id=place_id, start=start, end=end,
+                                                                transport_id=transport_id))
+        return reservations, set()
+
+    async def reserve(self, start: datetime, end: datetime, places: Optional[List[int]] = None,
+                      count: Optional[int] = None, transport: Optional[int] = None) -> List[ParkingReservation]:
+        """
+        Reserve the given places, or any count free places for a group, all or nothing.
+        InconsistencyError if the places are taken or there are not enough free places.
+        """
+        if end <= start:
+            raise InconsistencyError(message="Reservation must end after it starts.")
+        if not places and not count:
+            raise InconsistencyError(message="Places or count of places must be given.")
+        if not places and count < 0:
+            raise InconsistencyError(message="Count of places must be positive.")
+        await self.ensure_loaded()
+        started = time.perf_counter()
+        taken: Set[int] = set()
+        try:
+            for _ in range(settings.PARKING_RESERVE_ATTEMPTS):
+                place_ids = list(dict.fromkeys(places)) if places else self.free_places(start, end, count, taken)
+                if count and not places and len(place_ids) < count:
+                    break
+                reservations, unavailable = await self._reserve(place_ids, start, end, transport)
+                if not unavailable:
+                    for reservation in reservations:
+                        self._add(reservation.id, reservation.parking_place_id, start.timestamp(), end.timestamp())
+                    metrics.increment("parking.reserved", len(reservations))
+                    return reservations
+                # the index missed reservations of other workers
+                metrics.increment("parking.conflicts")
+                await self.refresh_places(unavailable)
+                if places:
+                    raise InconsistencyError(message=f"Parking places {sorted(unavailable)} are not available "
+                                                     f"for the interval.")
+                taken |= unavailable
+        finally:
+            metrics.observe("parking.reserve", time.perf_counter() - started)
+        raise InconsistencyError(message=f"There are no {count} free parking places for the interval.")
+
+    @atomic()
+    async def _release(self, reservation_id: int) -> None:
+        reservation = await ParkingReservation.get_or_none(id=reservation_id)
+        if reservation is None:
+            raise InconsistencyError(message=f"ParkingReservation with id={reservation_id} does not exist.")
+        await reservation.delete()
+
+    async def release(self, reservation_id: int) -> int:
+        await self._release(reservation_id)
+        self._discard(reservation_id)
+        return reservation_id
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Can't reload parking availability. Exception: {e}")
+
+    async def start(self) -> None:
+        await self.load()
+        if self._watcher is None and self.reload_interval > 0:
+            self._watcher = asyncio.get_running_loop().create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+parking_availability = ParkingAvailability(settings.PARKING_INDEX_RELOAD_INTERVAL)
+metrics.register_gauge("parking.reservations", lambda: len(parking_availability))
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+from tortoise.expressions import Q
+
+import settings
+from core.utils.metrics import metrics
+from infrastructure.database.models import Claim, ClaimToZone, Pass
+
+
+class PassAccess(NamedTuple):
+    pass_id: int
+    valid: bool
+    # POSIX timestamp of Pass.valid_till
+    valid_till: float
+    zones: FrozenSet[int]
+
+
+class PassAccessIndex:
+    """
+    Access rights of RFID passes kept in memory by every worker: rfid -> validity and ids of the zones
+    of approved claims the pass is linked to, directly or through ClaimToZone.pass_id.
+    PassService, ClaimService and ClaimToZoneAccess reread the affected passes after their transactions commit.
+    A full reload every settings.PASS_INDEX_RELOAD_INTERVAL seconds picks up changes made by other workers.
+    """
+
+    def __init__(self, reload_interval: float):
+        self.reload_interval = reload_interval
+        self._by_rfid: Dict[int, PassAccess] = {}
+        self._rfids: Dict[int, int] = {}
+        # claim id / ClaimToZone id -> passes whose zones depend on it, to find passes that lost access
+        self._claim_passes: Dict[int, Set[int]] = {}
+        self._link_passes: Dict[int, Set[int]] = {}
+        # pass id -> (claim ids, ClaimToZone ids) it is registered under in the maps above
+        self._pass_links: Dict[int, Tuple[Set[int], Set[int]]] = {}
+        self._loaded = False
+        self._watcher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._by_rfid)
+
+    @staticmethod
+    async def _fetch(pass_ids: Optional[Set[int]] = None) -> Tuple[list, list]:
+        passes, links = Pass.filter(rfid__isnull=False), ClaimToZone.all()
+        if pass_ids is not None:
+            passes = passes.filter(id__in=pass_ids)
+            links = links.filter(Q(pass_id_id__in=pass_ids) | Q(claim__pass_id_id__in=pass_ids))
+        pass_rows = await passes.values("id", "rfid", "valid", "valid_till")
+        link_rows = await links.values("id", "claim_id", "pass_id_id", "claim__pass_id_id",
+                                       "claim__approved", "zones__id")
+        return pass_rows, link_rows
+
+    def _drop(self, pass_id: int) -> None:
+        rfid = self._rfids.pop(pass_id, None)
+        entry = self._by_rfid.get(rfid)
+        if entry is not None and entry.pass_id == pass_id:
+            del self._by_rfid[rfid]
+        claim_ids, link_ids = self._pass_links.pop(pass_id, ((), ()))
+        for links, keys in ((self._claim_passes, claim_ids), (self._link_passes, link_ids)):
+            for key in keys:
+                passes = links.get(key)
+                if passes is not None:
+                    passes.discard(pass_id)
+                    if not passes:
+                        del links[key]
+
+    def _apply(self, pass_rows: Iterable[dict], link_rows: Iterable[dict], pass_ids: Optional[Set[int]]) -> None:
+        zones: Dict[int, Set[int]] = {}
+        for row in link_rows:
+            for pass_id in {row["pass_id_id"], row["claim__pass_id_id"]} - {None}:
+                if pass_ids is not None and pass_id not in pass_ids:
+                    continue
+                claim_ids, link_ids = self._pass_links.setdefault(pass_id, (set(), set()))
+                claim_ids.add(row["claim_id"])
+                link_ids.add(row["id"])
+                self._claim_passes.setdefault(row["claim_id"], set()).add(pass_id)
+                self._link_passes.setdefault(row["id"], set()).add(pass_id)
+                if row["claim__approved"] and row["zones__id"] is not None:
+                    zones.setdefault(pass_id, set()).add(row["zones__id"])
+        for row in pass_rows:
+            self._rfids[row["id"]] = row["rfid"]
+            self._by_rfid[row["rfid"]] = PassAccess(row["id"], row["valid"], row["valid_till"].timestamp(),
+                                                    frozenset(zones.get(row["id"], ())))
+
+    async def load(self) -> None:
+        pass_rows, link_rows = await self._fetch()
+        self._by_rfid, self._rfids, self._claim_passes, self._link_passes, self._pass_links = {}, {}, {}, {}, {}
+        self._apply(pass_rows, link_rows, None)
+        self._loaded = True
+
+    async def ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self.load()
+
+    async def refresh_passes(self, pass_ids: Set[int]) -> None:
+        """Reread the passes and their zones, passes that no longer exist are removed"""
+        if not pass_ids:
+            return
+        pass_rows, link_rows = await self._fetch(pass_ids)
+        for pass_id in pass_ids:
+            self._drop(pass_id)
+        self._apply(pass_rows, link_rows, pass_ids)
+
+    async def _affected_passes(self, claim_ids: Set[int], link_ids: Set[int]) -> Set[int]:
+        pass_ids = set()
+        for claim_id in claim_ids:
+            pass_ids |= self._claim_passes.get(claim_id, set())
+        for link_id in link_ids:
+            pass_ids |= self._link_passes.get(link_id, set())
+        if claim_ids:
+            pass_ids.update(await Claim.filter(id__in=claim_ids).values_list("pass_id_id", flat=True))
+        if claim_ids or link_ids:
+            rows = await ClaimToZone.filter(Q(claim_id__in=claim_ids) | Q(id__in=link_ids)) \
+                .values_list("pass_id_id", "claim__pass_id_id")
+            for row in rows:
+                pass_ids.update(row)
+        pass_ids.discard(None)
+        return pass_ids
+
+    async def refresh_changes(self, passes: Iterable[int] = (), claims: Iterable[int] = (),
+                              links: Iterable[int] = ()) -> None:
+        """Reread the passes that are or were linked to the changed passes, claims and ClaimToZone rows"""
+        if not self._loaded:
+            # the index is not used by this process, the first load reads everything anyway
+            return
+        await self.refresh_passes(set(passes) | await self._affected_passes(set(claims), set(links)))
+
+    def decide(self, rfid: int, zone_id: int, now: Optional[float] = None) -> Tuple[bool, str, Optional[int]]:
+        """(allow, reason, pass id) for the pass with the rfid presented at the zone"""
+        entry = self._by_rfid.get(rfid)
+        if entry is None:
+            return False, "unknown_rfid", None
+        if not entry.valid:
+            return False, "invalid", entry.pass_id
+        if entry.valid_till < (time.time() if now is None else now):
+            return False, "expired", entry.pass_id
+        if zone_id not in entry.zones:
+            return False, "zone_denied", entry.pass_id
+        return True, "allowed", entry.pass_id
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Can't reload pass access index. Exception: {e}")
+
+    async def start(self) -> None:
+        await self.load()
+        if self._watcher is None and self.reload_interval > 0:
+            self._watcher = asyncio.get_running_loop().create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+pass_index = PassAccessIndex(settings.PASS_INDEX_RELOAD_INTERVAL)
+metrics.register_gauge("access.passes", lambda: len(pass_index))
@@ -0,0 +1,58 @@
+from typing import Tuple
+
+import settings
+from core.dto.service import EmailStruct
+from core.utils.cache import TTLCache
+from infrastructure.database.models import SystemUser, ClaimWay
+
+# (email, "Hello, Name!\n ") of every recipient
+Recipients = Tuple[Tuple[str, str], ...]
+
+
+class RecipientDirectory:
+    """
+    Notification recipients cached per worker: members of a role by role name and users of a ClaimWay.
+    Entries are dropped when users, roles or claim ways change in this worker and expire after ttl
+    seconds, so changes made by other workers are seen after ttl at most.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._roles = TTLCache(maxsize, ttl)
+        self._claim_ways = TTLCache(maxsize, ttl)
+
+    @staticmethod
+    def _greetings(users) -> Recipients:
+        return tuple((user.email, f"Hello, {user.first_name.title()}!\n ") for user in users)
+
+    async def role_members(self, role_name: str) -> Recipients:
+        members = self._roles.get(role_name)
+        if members is None:
+            users = await SystemUser.filter(scopes__name=role_name, deleted=False).distinct()
+            members = self._greetings(users)
+            self._roles.set(role_name, members)
+        return members
+
+    async def claim_way_notification(self, claim_way: ClaimWay) -> EmailStruct:
+        email_struct = self._claim_ways.get(claim_way.id)
+        if email_struct is None:
+            users = await SystemUser.filter(claim_ways=claim_way.id)
+            members = self._greetings(users)
+            email_struct = EmailStruct(email=[email for email, _ in members],
+                                       text=[greeting + settings.CLAIMWAY_BODY_TEXT for _, greeting in members],
+                                       subject=settings.CLAIMWAY_SUBJECT_TEXT)
+            self._claim_ways.set(claim_way.id, email_struct)
+        return email_struct
+
+    def invalidate_roles(self) -> None:
+        self._roles.clear()
+
+    def invalidate_claim_way(self, claim_way_id: int) -> None:
+        self._claim_ways.pop(claim_way_id)
+
+    def invalidate_users(self) -> None:
+        """Names, emails or roles of users changed, every cached recipient list may be outdated"""
+        self._roles.clear()
+        self._claim_ways.clear()
+
+
+recipients = RecipientDirectory(settings.RECIPIENTS_CACHE_SIZE, settings.RECIPIENTS_CACHE_TTL)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Union
+from typing import List, Union
 from tortoise import exceptions
 from tortoise.transactions import atomic
 
@@ -10,6 +10,7 @@ from core.dto.service import (VisitorDto,
                               PassportDto,
                               MilitaryIdDto,
                               VisitSessionDto,
+                              VisitorBulkDto,
                               DriveLicenseDto,
                               PassDto,
                               TransportDto)
@@ -25,11 +26,14 @@ from infrastructure.database.models import (Passport,
                                             VisitSession,
                                             VisitorFoto,
                                             ParkingPlace,
-                                            Claim,
-                                            BlackList)
+                                            Claim)
 from application.exceptions import InconsistencyError
 from application.service.base_service import BaseService
 from application.service.black_list import BlackListService
+from application.service.black_list_index import black_list_index
+from application.service.occupancy import occupancy
+from application.service.pass_index import pass_index
+from application.service.visitor_import import ImportRow, parse_rows, resolve_rows, insert_rows
 from core.plugins.plugins_wrap import AddPlugins
 
 
@@ -68,9 +72,9 @@ class VisitorService(BaseService):
                                            claim=documents["claim"])
             # TODO visitor_foto
 
-            visitor_in_black_list = await BlackList.exists(visitor=visitor)
+            visitor_in_black_list = bool(await black_list_index.screen_visitor(visitor, documents))
             if visitor_in_black_list:
-                self.notify(NotifyVisitorInBlackListEvent(await BlackListService.collect_target_users(visitor)))
+                await self.notify(NotifyVisitorInBlackListEvent(await BlackListService.collect_target_users(visitor)))
 
             return visitor
 
@@ -83,12 +87,12 @@ class VisitorService(BaseService):
         if visitor is None:
             raise InconsistencyError(message=f"Visitor with id={entity_id} does not exist.")
 
-        visitor_in_black_list = await BlackList.exists(visitor=visitor)
-        if visitor_in_black_list:
-            self.notify(NotifyVisitorInBlackListEvent(await BlackListService.collect_target_users(visitor)))
-
         documents = await self.get_visitor_documents(dto)
 
+        visitor_in_black_list = bool(await black_list_index.screen_visitor(visitor, documents))
+        if visitor_in_black_list:
+            await self.notify(NotifyVisitorInBlackListEvent(await BlackListService.collect_target_users(visitor)))
+
         try:
             if documents["pass_id"]:
                 if visitor_in_black_list:
@@ -113,6 +117,21 @@ class VisitorService(BaseService):
         except exceptions.IntegrityError as ex:
             raise InconsistencyError(message=f"{ex}")
 
+    async def bulk_create(self, system_user: SystemUser, dto: VisitorBulkDto.CreationDto) -> List[dict]:
+        """Create visitors of a group with their documents, rows with errors are skipped"""
+        rows = await self.import_rows(parse_rows(enumerate(dto.visitors), dto.claim))
+        return [row.result() for row in rows]
+
+    @atomic()
+    async def import_rows(self, rows: List[ImportRow]) -> List[ImportRow]:
+        """Insert parsed rows in one transaction, the rows get their visitors or errors"""
+        await resolve_rows(rows)
+        await insert_rows(rows)
+        for row in rows:
+            if row.visitor is not None and row.matches:
+                await self.notify(NotifyVisitorInBlackListEvent(await BlackListService.collect_target_users(row.visitor)))
+        return rows
+
     @atomic()
     async def delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
         await EntityRepository.check_not_exist_or_delete(Visitor, entity_id)
@@ -190,8 +209,23 @@ class MilitaryIdService(BaseService):
 class VisitSessionService(BaseService):
     target_model = VisitSession
 
-    @atomic()
     async def create(self, system_user: SystemUser, dto: VisitSessionDto.CreationDto) -> VisitSession:
+        visit_session = await self._create(system_user, dto)
+        await occupancy.refresh_session(visit_session.id)
+        return visit_session
+
+    async def update(self, system_user: SystemUser, entity_id: EntityId, dto: VisitSessionDto.UpdateDto) -> VisitSession:
+        visit_session = await self._update(system_user, entity_id, dto)
+        await occupancy.refresh_session(visit_session.id)
+        return visit_session
+
+    async def delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
+        await self._delete(system_user, entity_id)
+        occupancy.remove_session(entity_id)
+        return entity_id
+
+    @atomic()
+    async def _create(self, system_user: SystemUser, dto: VisitSessionDto.CreationDto) -> VisitSession:
 
         visitor = await Visitor.get_or_none(id=dto.visitor)
         if visitor is None:
@@ -204,7 +238,7 @@ class VisitSessionService(BaseService):
         return visit_session
 
     @atomic()
-    async def update(self, system_user: SystemUser, entity_id: EntityId, dto: VisitSessionDto.UpdateDto) -> VisitSession:
+    async def _update(self, system_user: SystemUser, entity_id: EntityId, dto: VisitSessionDto.UpdateDto) -> VisitSession:
         visit_session = await VisitSession.get_or_none(id=entity_id)
         if visit_session is None:
             raise InconsistencyError(message=f"VisitSession with id={entity_id} does not exist.")
@@ -223,7 +257,7 @@ class VisitSessionService(BaseService):
         return visit_session
 
     @atomic()
-    async def delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
+    async def _delete(self, system_user: SystemUser, entity_id: EntityId) -> EntityId:
         visit_session = await VisitSession.get_or_none(id=entity_id)
         if visit_session is None:
             raise InconsistencyError(message=f"VisitSession with id={entity_id} does not exist.")
@@ -275,8 +309,23 @@ class VisitorFotoService(BaseService):
 class PassService(BaseService):
     target_model = Pass
 
-    @atomic()
     async def create(self, system_user: EntityId, dto: PassDto.CreationDto) -> AbstractBaseModel:
+        visitor_pass = await self._create(system_user, dto)
+        await pass_index.refresh_changes(passes=(visitor_pass.id,))
+        return visitor_pass
+
+    async def update(self, system_user: EntityId, entity_id: EntityId, dto: PassDto.UpdateDto) -> Pass:
+        visitor_pass = await self._update(system_user, entity_id, dto)
+        await pass_index.refresh_changes(passes=(entity_id,))
+        return visitor_pass
+
+    async def delete(self, system_user: EntityId, entity_id: EntityId) -> EntityId:
+        await self._delete(system_user, entity_id)
+        await pass_index.refresh_changes(passes=(entity_id,))
+        return entity_id
+
+    @atomic()
+    async def _create(self, system_user: EntityId, dto: PassDto.CreationDto) -> AbstractBaseModel:
         valid_till = datetime.strptime(dto.valid_till, settings.ACCESS_DATETIME_FORMAT)
 
         visitor_pass = await Pass.create(rfid=dto.rfid,
@@ -285,7 +334,7 @@ class PassService(BaseService):
         return visitor_pass
 
     @atomic()
-    async def update(self, system_user: EntityId, entity_id: EntityId, dto: PassDto.UpdateDto) -> Pass:
+    async def _update(self, system_user: EntityId, entity_id: EntityId, dto: PassDto.UpdateDto) -> Pass:
         visitor_pass = await Pass.get_or_none(id=entity_id)
         if visitor_pass is None:
             raise InconsistencyError(message=f"Pass with id={entity_id} does not exist.")
@@ -303,7 +352,7 @@ class PassService(BaseService):
         return visitor_pass
 
     @atomic()
-    async def delete(self, system_user: EntityId, entity_id: EntityId) -> EntityId:
+    async def _delete(self, system_user: EntityId, entity_id: EntityId) -> EntityId:
         visitor_pass = await Pass.get_or_none(id=entity_id)
         if visitor_pass is None:
             raise InconsistencyError(message=f"Pass with id={entity_id} does not exist.")
@@ -0,0 +1,233 @@
+import csv
+from datetime import date, datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from pydantic import ValidationError
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl is optional, without it only CSV files can be imported
+    openpyxl = None
+
+import settings
+from application.service.black_list_index import black_list_index
+from core.dto.service import VisitorBulkDto
+from infrastructure.database.models import (AbstractBaseModel,
+                                            Claim,
+                                            DriveLicense,
+                                            MilitaryId,
+                                            Pass,
+                                            Passport,
+                                            Transport,
+                                            Visitor)
+from infrastructure.database.repository import EntityRepository
+
+# document field of the visitor -> model and its date fields given in settings.ACCESS_DATE_FORMAT
+DOCUMENTS: Dict[str, Tuple[Type[AbstractBaseModel], Tuple[str, ...]]] = {
+    "passport": (Passport, ("date_of_birth",)),
+    "drive_license": (DriveLicense, ("date_of_issue", "expiration_date")),
+    "military_id": (MilitaryId, ("date_of_birth", "date_of_issue")),
+}
+# documents with unique numbers
+_UNIQUE_DOCUMENTS = ("passport", "drive_license")
+_VISITOR_FIELDS = ("first_name", "last_name", "middle_name", "who_invited", "destination")
+
+
+def validation_errors(ex: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in ex.errors()]
+
+
+class ImportRow:
+    """A visitor row of a bulk import and its outcome"""
+    __slots__ = ("index", "item", "documents", "claim", "errors", "matches", "visitor")
+
+    def __init__(self, index: int, item: Optional[VisitorBulkDto.ItemDto] = None, errors: List[str] = None):
+        self.index = index
+        self.item = item
+        # document kind -> field values of the document to create
+        self.documents: Dict[str, dict] = {}
+        self.claim: Optional[int] = None
+        self.errors = errors or []
+        self.matches: List[str] = []
+        self.visitor: Optional[Visitor] = None
+
+    def result(self) -> dict:
+        return {"row": self.index,
+                "visitor": self.visitor.id if self.visitor is not None else None,
+                "in_black_list": bool(self.matches),
+                "matches": self.matches,
+                "errors": self.errors}
+
+
+def parse_rows(rows: Iterable[Tuple[int, dict]], claim: Optional[int] = None) -> List[ImportRow]:
+    """Validate (index, raw row) pairs and parse document dates, invalid rows get their errors"""
+    parsed = []
+    for index, raw in rows:
+        try:
+            row = ImportRow(index, VisitorBulkDto.ItemDto.parse_obj(raw))
+        except ValidationError as ex:
+            parsed.append(ImportRow(index, errors=validation_errors(ex)))
+            continue
+        row.claim = row.item.claim or claim
+        for kind, (_, date_fields) in DOCUMENTS.items():
+            document = getattr(row.item, kind)
+            if document is None:
+                continue
+            values = document.dict()
+            for field in date_fields:
+                try:
+                    if values[field]:
+                        values[field] = datetime.strptime(values[field], settings.ACCESS_DATE_FORMAT)
+                except ValueError:
+                    row.errors.append(f"{kind}.{field}: must be given in {settings.ACCESS_DATE_FORMAT} format")
+            row.documents[kind] = values
+        parsed.append(row)
+    return parsed
+
+
+def _unflatten(values: dict) -> dict:
+    """Spreadsheet row to a bulk row: "passport.number" column goes to row["passport"]["number"], empty cells are dropped"""
+    row = {}
+    for key, value in values.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if key is None or value is None or value == "":
+            continue
+        if isinstance(value, (date, datetime)):
+            value = value.strftime(settings.ACCESS_DATE_FORMAT)
+        document, _, field = str(key).strip().partition(".")
+        if field:
+            row.setdefault(document, {})[field] = value
+        else:
+            row[document] = value
+    return row
+
+
+def read_csv(path: str) -> Iterator[Tuple[int, dict]]:
+    """(line number, row) of a CSV file with a header, delimiter is detected"""
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        try:
+            dialect = csv.Sniffer().sniff(file.read(4096), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        file.seek(0)
+        reader = csv.DictReader(file, dialect=dialect)
+        for values in reader:
+            yield reader.line_num, _unflatten(values)
+
+
+def read_xlsx(path: str) -> Iterator[Tuple[int, dict]]:
+    """(row number, row) of the first sheet of an XLSX file with a header, read without loading the whole sheet"""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        for number, values in enumerate(rows, start=2):
+            row = _unflatten(dict(zip(header, values)))
+            if row:
+                yield number, row
+    finally:
+        workbook.close()
+
+
+READERS: Dict[str, Callable[[str], Iterator[Tuple[int, dict]]]] = {"csv": read_csv}
+if openpyxl is not None:
+    READERS["xlsx"] = read_xlsx
+
+
+def next_chunk(rows: Iterator[Tuple[int, dict]], size: int, claim: Optional[int] = None) -> List[ImportRow]:
+    """Parse the next size rows of a reader, empty list when it is exhausted"""
+    return parse_rows(islice(rows, size), claim)
+
+
+def _duplicates(rows: List[ImportRow], key) -> Dict[object, int]:
+    """key value -> index of the first row that has it, for the values several rows share"""
+    first, duplicates = {}, {}
+    for row in rows:
+        value = key(row)
+        if value is None:
+            continue
+        if value in first:
+            duplicates[value] = first[value]
+        else:
+            first[value] = row.index
+    return duplicates
+
+
+async def resolve_rows(rows: List[ImportRow]) -> None:
+    """Check references and uniqueness with one IN query per kind, screen against the blacklist"""
+    rows = [row for row in rows if not row.errors]
+    pass_ids = {row.item.pass_id for row in rows} - {None}
+    transport_ids = {row.item.transport for row in rows} - {None}
+    claim_ids = {row.claim for row in rows} - {None}
+
+    existing_numbers = {}
+    for kind in _UNIQUE_DOCUMENTS:
+        model = DOCUMENTS[kind][0]
+        numbers = {row.documents[kind]["number"] for row in rows if kind in row.documents}
+        existing_numbers[kind] = set(await model.filter(number__in=numbers).values_list("number", flat=True)) \
+            if numbers else set()
+    passes = set(await Pass.filter(id__in=pass_ids).values_list("id", flat=True)) if pass_ids else set()
+    taken_passes = set(await Visitor.filter(pass_id_id__in=pass_ids).values_list("pass_id_id", flat=True)) \
+        if pass_ids else set()
+    transports = dict(await Transport.filter(id__in=transport_ids).values_list("id", "number")) \
+        if transport_ids else {}
+    claims = set(await Claim.filter(id__in=claim_ids).values_list("id", flat=True)) if claim_ids else set()
+
+    duplicates = {kind: _duplicates(rows, lambda row, kind=kind: row.documents.get(kind, {}).get("number"))
+                  for kind in _UNIQUE_DOCUMENTS}
+    duplicate_passes = _duplicates(rows, lambda row: row.item.pass_id)
+
+    await black_list_index.ensure_fresh()
+    for row in rows:
+        for kind in _UNIQUE_DOCUMENTS:
+            number = row.documents.get(kind, {}).get("number")
+            if number in existing_numbers[kind]:
+                row.errors.append(f"{kind}: number {number} already exists")
+            elif number in duplicates[kind] and duplicates[kind][number] != row.index:
+                row.errors.append(f"{kind}: number {number} is already used in row {duplicates[kind][number]}")
+        pass_id = row.item.pass_id
+        if pass_id is not None:
+            if pass_id not in passes:
+                row.errors.append(f"pass_id: Pass with id={pass_id} does not exist")
+            elif pass_id in taken_passes:
+                row.errors.append(f"pass_id: Pass with id={pass_id} is already given to a visitor")
+            elif pass_id in duplicate_passes and duplicate_passes[pass_id] != row.index:
+                row.errors.append(f"pass_id: Pass with id={pass_id} is already used in row {duplicate_passes[pass_id]}")
+        if row.item.transport is not None and row.item.transport not in transports:
+            row.errors.append(f"transport: Transport with id={row.item.transport} does not exist")
+        if row.claim is not None and row.claim not in claims:
+            row.errors.append(f"claim: Claim with id={row.claim} does not exist")
+
+        row.matches = black_list_index.screen(**{kind: document["number"] for kind, document in row.documents.items()},
+                                              transport=transports.get(row.item.transport))
+        if row.matches and pass_id is not None:
+            row.errors.append("pass_id: visitor is in BlackList")
+
+
+async def insert_rows(rows: List[ImportRow]) -> List[Visitor]:
+    """Insert valid rows, documents first, with one bulk_create per model. Call in a transaction"""
+    rows = [row for row in rows if not row.errors]
+    document_ids: Dict[Tuple[str, int], int] = {}
+    for kind, (model, _) in DOCUMENTS.items():
+        owners = [row for row in rows if kind in row.documents]
+        if not owners:
+            continue
+        ids = await EntityRepository.allocate_ids(model, len(owners))
+        await model.bulk_create([model(id=document_id, **row.documents[kind])
+                                 for row, document_id in zip(owners, ids)])
+        document_ids.update(((kind, row.index), document_id) for row, document_id in zip(owners, ids))
+
+    visitor_ids = await EntityRepository.allocate_ids(Visitor, len(rows))
+    for row, visitor_id in zip(rows, visitor_ids):
+        row.visitor = Visitor(id=visitor_id,
+                              **{field: getattr(row.item, field) for field in _VISITOR_FIELDS},
+                              **{f"{kind}_id": document_ids[kind, row.index] for kind in row.documents},
+                              pass_id_id=row.item.pass_id,
+                              transport_id=row.item.transport,
+                              claim_id=row.claim)
+    visitors = [row.visitor for row in rows]
+    if visitors:
+        await Visitor.bulk_create(visitors)
+    return visitors
@@ -0,0 +1,18 @@
+from typing import Dict, Iterable, List, Tuple
+
+
+def aggregate_notifications(payloads: Iterable[dict]) -> List[dict]:
+    """
+    Merge email notifications into one batch. payloads are EmailStruct.dict(): parallel email and text
+    lists with one subject. Recipients of identical subject and text share one message, a recipient gets
+    each distinct message once, so alerts with one subject and different texts are all delivered.
+    """
+    # (subject, text) -> recipients in insertion order
+    messages: Dict[Tuple[str, str], Dict[str, None]] = {}
+    for users in payloads:
+        subject = users["subject"]
+        for email, text in zip(users["email"], users["text"]):
+            if email:
+                messages.setdefault((subject, text), {})[email] = None
+    return [{"subject": subject, "text": text, "emails": list(emails)}
+            for (subject, text), emails in messages.items()]
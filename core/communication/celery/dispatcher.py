@@ -0,0 +1,47 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from celery import Celery, Task
+
+from core.communication.celery.celery_ import celery
+from core.utils.metrics import metrics
+
+Message = Tuple[Task, tuple]
+
+
+class TaskDispatcher:
+    """
+    Publishes Celery tasks to the broker over one producer connection in a separate thread,
+    so the event loop is not blocked by the broker. Only OutboxRelay publishes, request handlers write
+    OutboxEvent rows instead, so the outbox table is the buffer between requests and the broker:
+    it is bounded by nothing but the database, survives restarts and needs no overflow policy.
+    """
+
+    def __init__(self, celery: Celery):
+        self.celery = celery
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="celery-dispatch")
+
+    def _publish(self, batch: List[Message]) -> None:
+        with self.celery.producer_or_acquire() as producer:
+            for task, args in batch:
+                task.apply_async(args, producer=producer)
+
+    async def publish(self, batch: List[Message]) -> None:
+        """Raises if the broker did not accept the batch"""
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._publisher, self._publish, batch)
+        except Exception:
+            metrics.increment("dispatch.errors")
+            raise
+        finally:
+            metrics.observe("dispatch.publish", time.perf_counter() - start)
+        metrics.increment("dispatch.published", len(batch))
+
+    def shutdown(self) -> None:
+        self._publisher.shutdown(wait=True)
+
+
+dispatcher = TaskDispatcher(celery)
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from loguru import logger
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from core.communication.celery.aggregator import aggregate_notifications
+from core.communication.celery.dispatcher import dispatcher
+from core.communication.celery.tasks import send_email_batch_celery
+from core.utils.metrics import metrics
+from infrastructure.database.models import OutboxEvent
+
+
+class OutboxRelay:
+    """
+    Publishes committed OutboxEvent rows to the broker, at least once.
+    A batch is claimed in a short transaction: rows are locked with FOR UPDATE SKIP LOCKED, so any number
+    of relays share the table, and leased by locked_until. The batch is published with no transaction open
+    and deleted in a second short transaction only after the broker accepted it. Rows of a relay that died
+    are claimed again when the lease expires.
+    Notifications of one batch are merged, so events committed within a poll interval are sent as one task.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, lease: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def _claim(self) -> List[OutboxEvent]:
+        now = datetime.now().astimezone()
+        async with in_transaction():
+            events = await OutboxEvent.filter(Q(locked_until=None) | Q(locked_until__lt=now)).order_by("id") \
+                .limit(self.batch_size).select_for_update(skip_locked=True)
+            if events:
+                await OutboxEvent.filter(id__in=[event.id for event in events]) \
+                    .update(locked_until=now + timedelta(seconds=self.lease))
+        return events
+
+    async def relay_once(self) -> int:
+        events = await self._claim()
+        if not events:
+            return 0
+        event_ids = [event.id for event in events]
+        messages = aggregate_notifications(event.payload for event in events)
+        try:
+            if messages:
+                await dispatcher.publish([(send_email_batch_celery, (messages,))])
+        except Exception:
+            # retry on the next poll instead of waiting for the lease
+            await OutboxEvent.filter(id__in=event_ids).update(locked_until=None)
+            raise
+        await OutboxEvent.filter(id__in=event_ids).delete()
+        metrics.increment("outbox.relayed", len(events))
+        return len(events)
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                relayed = await self.relay_once()
+            except Exception as e:
+                metrics.increment("outbox.errors")
+                logger.error(f"Can't relay outbox events. Exception: {e}")
+                relayed = 0
+            if relayed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._stopping = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self, timeout: float) -> None:
+        """Give the batch in flight up to timeout seconds, rows left in the outbox are relayed after restart"""
+        if self._worker is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._worker, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Outbox relay did not finish its batch in {timeout} seconds")
+        self._worker = None
@@ -1,41 +1,44 @@
-import asyncio
-import aiosmtplib
 from email.mime.text import MIMEText
+from typing import List
 
 import settings
-
-
-async def _send_email(users: dict) -> None:
-    """Create SMTP server"""
-    host = settings.MAIL_SERVER_HOST
-    port = settings.MAIL_SERVER_PORT
+from core.communication.celery.smtp_pool import SMTPConnectionPool
+
+smtp_pool = SMTPConnectionPool(settings.MAIL_SERVER_HOST,
+                               settings.MAIL_SERVER_PORT,
+                               settings.MAIL_SERVER_USER,
+                               settings.MAIL_SERVER_PASSWORD,
+                               size=settings.MAIL_POOL_SIZE,
+                               idle_timeout=settings.MAIL_POOL_IDLE_TIMEOUT,
+                               max_messages=settings.MAIL_MAX_MESSAGES_PER_CONNECTION)
+
+
+def users_to_messages(users: dict) -> List[dict]:
+    """EmailStruct.dict() to batch messages, every recipient once, identical texts share a message"""
+    messages = {}
+    seen = set()
+    for email, text in zip(users['email'], users['text']):
+        if email and email not in seen:
+            seen.add(email)
+            messages.setdefault(text, []).append(email)
+    return [{"subject": users['subject'], "text": text, "emails": emails} for text, emails in messages.items()]
+
+
+async def _send_messages(messages: List[dict]) -> None:
+    """
+    Sending emails through pooled SMTP connections, one email per text for up to MAIL_MAX_RECIPIENTS.
+    Recipients are given in the SMTP envelope only, so they don't see each other's addresses
+    """
     sender = settings.MAIL_SERVER_USER
-    password = settings.MAIL_SERVER_PASSWORD
-
-    loop = asyncio.get_event_loop()
-
-    smtp = aiosmtplib.SMTP(host, port, loop=loop, use_tls=False)
+    for item in messages:
+        emails = item['emails']
+        for start in range(0, len(emails), settings.MAIL_MAX_RECIPIENTS):
+            message = MIMEText(item['text'], _charset="utf-8", _subtype="plain")
+            message['From'] = sender
+            message['To'] = "undisclosed-recipients:;"
+            message['Subject'] = item['subject']
+            await smtp_pool.send(message, recipients=emails[start:start + settings.MAIL_MAX_RECIPIENTS])
 
-    await smtp.connect()
-    await smtp.starttls()
-    await smtp.login(sender, password)
-
-    async def send_a_message() -> None:
-        """Sending email"""
-        emails_count = len(set(users['email']))
-
-        for i in range(emails_count):
-            text = users['text'][i]
-            subject = users['subject']
-
-            if users['email'][i]:
-                recipient = users['email'][i]
-
-                # build message
-                message = MIMEText(text, _charset="utf-8", _subtype="plain")
-                message['From'] = sender
-                message['To'] = recipient
-                message['Subject'] = subject
-                await smtp.send_message(message)
-    await send_a_message()
 
+async def _send_email(users: dict) -> None:
+    await _send_messages(users_to_messages(users))
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from collections import deque
+from email.message import Message
+from typing import Deque, Optional, Sequence
+
+import aiosmtplib
+from loguru import logger
+
+
+class _PooledSMTP:
+    __slots__ = ("smtp", "sent", "last_used")
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of logged in SMTP connections bound to one event loop.
+    Connections idle longer than idle_timeout or used for max_messages messages are closed,
+    a message failed on a dropped connection is retried once on a fresh one.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 size: int, idle_timeout: float, max_messages: int):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._size = size
+        self._idle: Deque[_PooledSMTP] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self) -> _PooledSMTP:
+        smtp = aiosmtplib.SMTP(self.host, self.port, use_tls=False)
+        await smtp.connect()
+        await smtp.starttls()
+        await smtp.login(self.user, self.password)
+        return _PooledSMTP(smtp)
+
+    @staticmethod
+    async def _close(conn: _PooledSMTP) -> None:
+        try:
+            if conn.smtp.is_connected:
+                await conn.smtp.quit()
+        except aiosmtplib.SMTPException:
+            conn.smtp.close()
+
+    def _usable(self, conn: _PooledSMTP) -> bool:
+        return (conn.smtp.is_connected and conn.sent < self.max_messages
+                and time.monotonic() - conn.last_used < self.idle_timeout)
+
+    async def _acquire(self) -> _PooledSMTP:
+        while self._idle:
+            conn = self._idle.pop()
+            if self._usable(conn):
+                return conn
+            await self._close(conn)
+        return await self._connect()
+
+    def _release(self, conn: _PooledSMTP) -> None:
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    async def send(self, message: Message, recipients: Optional[Sequence[str]] = None) -> None:
+        """recipients are the envelope recipients, the To, Cc and Bcc headers of the message by default"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._size)
+        async with self._slots:
+            for attempt in range(2):
+                conn = await self._acquire()
+                try:
+                    await conn.smtp.send_message(message, recipients=recipients)
+                except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    await self._close(conn)
+                    if attempt:
+                        raise
+                    logger.warning(f"SMTP connection dropped, reconnecting: {e}")
+                    continue
+                except aiosmtplib.SMTPException:
+                    await self._close(conn)
+                    raise
+                conn.sent += 1
+                self._release(conn)
+                return
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._close(self._idle.pop())
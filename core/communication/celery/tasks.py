@@ -1,10 +1,25 @@
-from asgiref.sync import async_to_sync
+from typing import List
+
+from celery.signals import worker_process_shutdown
 
 from core.communication.celery.celery_ import celery
-from core.communication.celery.sending_emails import _send_email
+from core.communication.celery.sending_emails import _send_email, _send_messages, smtp_pool
+from core.communication.celery.worker_loop import worker_loop
 
 
 @celery.task(autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True)
 def send_email_celery(users: dict) -> None:
-    """Calling an async func for sending mails"""
-    async_to_sync(_send_email)(users)
+    """Calling an async func for sending mails on the long-lived worker loop"""
+    worker_loop.run(_send_email(users))
+
+
+@celery.task(autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True)
+def send_email_batch_celery(messages: List[dict]) -> None:
+    """Sending a batch of aggregated notifications, see aggregate_notifications"""
+    worker_loop.run(_send_messages(messages))
+
+
+@worker_process_shutdown.connect
+def close_worker_loop(**kwargs) -> None:
+    worker_loop.run(smtp_pool.close())
+    worker_loop.stop()
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+
+class WorkerLoop:
+    """
+    Long-lived event loop of a Celery worker process, running in its own thread.
+    Tasks submit coroutines to it, so connections opened on this loop survive between tasks.
+    """
+    __slots__ = ("_loop", "_thread", "_pid", "_lock")
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        # the loop is started lazily so every forked worker process gets its own one
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="celery-worker-loop",
+                                                daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """Run coroutine on the worker loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+            self._loop = None
+
+
+worker_loop = WorkerLoop()
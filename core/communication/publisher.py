@@ -2,6 +2,7 @@ from pyee.asyncio import AsyncIOEventEmitter
 
 from core.communication.event import Event
 from core.communication.subscriber import Subscriber
+from infrastructure.database.models import OutboxEvent
 
 
 class Publisher:
@@ -11,5 +12,9 @@ class Publisher:
     def __init__(self, emitter: AsyncIOEventEmitter):
         self._emitter = emitter
 
-    def notify(self, event: Event):
-        self._emitter.emit(event.name, event)
+    async def notify(self, event: Event):
+        """
+        Event is stored in the outbox with the current transaction, so it is published
+        by OutboxRelay only if the transaction commits
+        """
+        await OutboxEvent.create(name=event.name, payload=await event.to_celery())
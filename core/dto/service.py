@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Json, conlist
-from typing import Optional
+from pydantic import BaseModel, Json, conint, conlist, constr
+from typing import List, Optional
 
+import settings
 from core.dto.access import EntityId
 
 
@@ -83,11 +84,11 @@ class VisitSessionDto:
 class PassportDto:
     class CreationDto(BaseModel):
         number: int
-        division_code: Optional[str]
-        registration: Optional[str]
+        division_code: Optional[constr(max_length=7)]
+        registration: Optional[constr(max_length=255)]
         date_of_birth: Optional[str]
-        place_of_birth: Optional[str]
-        gender: Optional[str]
+        place_of_birth: Optional[constr(max_length=255)]
+        gender: Optional[constr(max_length=8)]
 
     class UpdateDto(BaseModel):
         number: Optional[int]
@@ -102,10 +103,10 @@ class DriveLicenseDto:
     class CreationDto(BaseModel):
         date_of_issue: Optional[str]
         expiration_date: Optional[str]
-        place_of_issue: Optional[str]
-        address_of_issue: Optional[str]
+        place_of_issue: Optional[constr(max_length=64)]
+        address_of_issue: Optional[constr(max_length=64)]
         number: int
-        categories: Optional[str]
+        categories: Optional[constr(max_length=16)]
 
     class UpdateDto(BaseModel):
         date_of_issue: Optional[str]
@@ -133,11 +134,11 @@ class VisitorFotoDto:
 
 class MilitaryIdDto:
     class CreationDto(BaseModel):
-        number: str
+        number: constr(max_length=16)
         date_of_birth: Optional[str]
-        place_of_issue: Optional[str]
+        place_of_issue: Optional[constr(max_length=64)]
         date_of_issue: Optional[str]
-        place_of_birth: Optional[str]
+        place_of_birth: Optional[constr(max_length=255)]
 
     class UpdateDto(BaseModel):
         number: Optional[str]
@@ -185,3 +186,47 @@ class BlackListDto:
     class UpdateDto(BaseModel):
         visitor: Optional[EntityId]
         level: Optional[str]
+
+    class ScreenItemDto(BaseModel):
+        visitor: Optional[EntityId]
+        passport: Optional[str]
+        drive_license: Optional[str]
+        military_id: Optional[str]
+        transport: Optional[str]
+
+    class ScreenDto(BaseModel):
+        claim: Optional[EntityId]
+        visitors: Optional[List["BlackListDto.ScreenItemDto"]]
+
+
+BlackListDto.ScreenDto.update_forward_refs(BlackListDto=BlackListDto)
+
+
+class VisitorBulkDto:
+    class ItemDto(BaseModel):
+        """Visitor with new documents, created together. Lengths match the columns, so a row fails alone"""
+        first_name: constr(max_length=24)
+        last_name: constr(max_length=24)
+        middle_name: Optional[constr(max_length=24)]
+        who_invited: Optional[constr(max_length=64)]
+        destination: Optional[constr(max_length=128)]
+        passport: Optional[PassportDto.CreationDto]
+        drive_license: Optional[DriveLicenseDto.CreationDto]
+        military_id: Optional[MilitaryIdDto.CreationDto]
+        pass_id: Optional[EntityId]
+        transport: Optional[EntityId]
+        claim: Optional[EntityId]
+
+    class CreationDto(BaseModel):
+        """Rows are validated one by one, so an invalid row does not reject the others"""
+        claim: Optional[EntityId]
+        visitors: conlist(item_type=dict, min_items=1, max_items=settings.VISITOR_BULK_MAX_ROWS)
+
+
+class ParkingReservationDto:
+    class CreationDto(BaseModel):
+        start: str
+        end: str
+        places: Optional[List[EntityId]]
+        count: Optional[conint(gt=0)]
+        transport: Optional[EntityId]
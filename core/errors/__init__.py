@@ -1,4 +1,5 @@
 # from core.errors.http_error import *
 from core.errors.dto_error import *
 from core.errors.base_error import *
-from core.errors.domain_error import *
\ No newline at end of file
+from core.errors.domain_error import *
+from core.errors.overload_error import *
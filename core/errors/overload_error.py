@@ -0,0 +1,8 @@
+from sanic.exceptions import SanicException
+
+
+class ServiceOverloaded(SanicException):
+    status_code = 429
+
+    def __init__(self, message="Service is overloaded, try again later.", **kwargs):
+        super().__init__(message, **kwargs)
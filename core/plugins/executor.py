@@ -0,0 +1,94 @@
+import asyncio
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import ModuleType
+from typing import Optional, Sequence, Set
+
+from loguru import logger
+
+import settings
+from core.utils.metrics import metrics
+
+
+class PluginExecutor:
+    """
+    Runs plugin hooks. Every hook is bounded by a timeout, sync hooks run in a thread pool,
+    "after" hooks of one call run concurrently and can be detached from the request.
+    A plugin module may override the defaults with TIMEOUT (seconds) and BACKGROUND (bool) attributes.
+    Latency of every hook is recorded as plugin.<name>.<hook>.
+    """
+    __slots__ = ("_timeout", "_background", "_max_workers", "_pool", "_pid", "_tasks")
+
+    def __init__(self, timeout: float, background: bool, max_workers: int):
+        self._timeout = timeout
+        self._background = background
+        self._max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="plugin")
+            self._pid = os.getpid()
+        return self._pool
+
+    async def call(self, plugin: ModuleType, hook_name: str, *args, **kwargs) -> None:
+        """Run one hook, errors and timeouts are logged and never reach the caller"""
+        hook = getattr(plugin, hook_name)
+        timeout = getattr(plugin, "TIMEOUT", self._timeout)
+        name = f"plugin.{plugin.__name__}.{hook_name}"
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(hook):
+                await asyncio.wait_for(hook(*args, **kwargs), timeout)
+            else:
+                # a timed out sync hook keeps its thread until it returns, the caller just stops waiting
+                future = asyncio.get_running_loop().run_in_executor(self._get_pool(), partial(hook, *args, **kwargs))
+                await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            metrics.increment(f"{name}.timeouts")
+            logger.error(f"Plugin \"{plugin.__name__}\" {hook_name} timed out after {timeout}s")
+        except Exception as e:
+            metrics.increment(f"{name}.errors")
+            logger.error(f"Can't run plugin \"{plugin.__name__}\". Exception: {e}")
+        finally:
+            metrics.observe(name, time.perf_counter() - start)
+
+    async def run_before(self, plugins: Sequence[ModuleType], *args, **kwargs) -> None:
+        """before hooks run one by one in registration order, they may prepare arguments for the next one"""
+        for plugin in plugins:
+            await self.call(plugin, "before", *args, **kwargs)
+
+    async def run_after(self, plugins: Sequence[ModuleType], *args, result=None, **kwargs) -> None:
+        awaited = []
+        for plugin in plugins:
+            coroutine = self.call(plugin, "after", *args, result=result, **kwargs)
+            if getattr(plugin, "BACKGROUND", self._background):
+                task = asyncio.get_running_loop().create_task(coroutine)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            else:
+                awaited.append(coroutine)
+        if awaited:
+            await asyncio.gather(*awaited)
+
+    @property
+    def background_tasks(self) -> int:
+        return len(self._tasks)
+
+    def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+plugin_executor = PluginExecutor(settings.PLUGINS_TIMEOUT,
+                                 settings.PLUGINS_AFTER_IN_BACKGROUND,
+                                 settings.PLUGINS_EXECUTOR_WORKERS)
+metrics.register_gauge("plugins.background_tasks", lambda: plugin_executor.background_tasks)
@@ -0,0 +1,110 @@
+import asyncio
+import importlib.util
+import os
+from types import ModuleType
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from tortoise.signals import post_delete, post_save
+
+import settings
+from infrastructure.database.models import Plugin
+
+FileSignature = Tuple[int, int]
+
+
+class PluginRegistry:
+    """
+    Enabled plugins grouped by entrypoint, loaded once and kept in memory.
+    Imported modules are cached by file path and reimported only when the file mtime/size changes.
+    The registry is refreshed when a Plugin row is saved or deleted in this worker,
+    and every settings.PLUGINS_REFRESH_INTERVAL seconds to see changes made elsewhere.
+    """
+
+    def __init__(self, plugins_dir: str, refresh_interval: float):
+        self.plugins_dir = plugins_dir
+        self.refresh_interval = refresh_interval
+        self._plugins: Dict[str, Tuple[ModuleType, ...]] = {}
+        self._modules: Dict[str, Tuple[FileSignature, ModuleType]] = {}
+        self._stale = True
+        self._lock: Optional[asyncio.Lock] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    def get_plugin_filepath(self, plugin: Plugin) -> str:
+        return os.path.join(self.plugins_dir, plugin.filename)
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    async def get(self, entrypoint: str) -> Tuple[ModuleType, ...]:
+        if self._stale:
+            await self.refresh()
+        return self._plugins.get(entrypoint, ())
+
+    async def refresh(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._stale = False
+            plugins = await Plugin.filter(enabled=True).order_by("id")
+            grouped: Dict[str, list] = {}
+            modules: Dict[str, Tuple[FileSignature, ModuleType]] = {}
+            for plugin in plugins:
+                path = self.get_plugin_filepath(plugin)
+                imported = self._import(plugin, path)
+                if imported is None:
+                    continue
+                modules[path] = imported
+                grouped.setdefault(plugin.entrypoint, []).append(imported[1])
+            self._modules = modules
+            self._plugins = {entrypoint: tuple(items) for entrypoint, items in grouped.items()}
+
+    def _import(self, plugin: Plugin, path: str) -> Optional[Tuple[FileSignature, ModuleType]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            logger.error(f"For plugin \"{plugin.name}\" file \"{plugin.filename}\" not found")
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._modules.get(path)
+        if cached and cached[0] == signature:
+            return cached
+        try:
+            spec = importlib.util.spec_from_file_location(plugin.name, path)
+            imported = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(imported)
+        except Exception as e:
+            logger.error(f"Can't import plugin \"{plugin.name}\". Exception: {e}")
+            return None
+        return signature, imported
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Can't refresh plugins. Exception: {e}")
+
+    def start(self) -> None:
+        if self._watcher is None and self.refresh_interval > 0:
+            self._watcher = asyncio.get_event_loop().create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+plugin_registry = PluginRegistry(os.path.join(os.getcwd(), settings.PLUGINS_DIRNAME),
+                                 settings.PLUGINS_REFRESH_INTERVAL)
+
+
+@post_save(Plugin)
+async def _plugin_saved(sender, instance, created, using_db, update_fields) -> None:
+    plugin_registry.invalidate()
+
+
+@post_delete(Plugin)
+async def _plugin_deleted(sender, instance, using_db) -> None:
+    plugin_registry.invalidate()
@@ -1,18 +1,25 @@
+import hashlib
+import hmac
 import json
 import pytz
+from copy import copy
 from datetime import timedelta, datetime
 from functools import wraps
-from typing import Dict, Tuple, Union
+from typing import Dict, FrozenSet, Iterable, Tuple, Union
 from sanic import Sanic, Request, HTTPResponse
 from sanic import json as json_response
 from sanic.views import HTTPMethodView
-from tortoise.transactions import atomic
+from tortoise.transactions import atomic, in_transaction
 
-from infrastructure.database.models import SystemUser, SystemUserSession
+import settings
+from infrastructure.database.models import SystemUser, SystemUserSession, Role
+from infrastructure.database.versions import VersionStamp
 
 from core.errors.auth_errors import MissingAuthorizationCookie, AuthenticationFailed, ScopesFailed
 from core.dto import validate
+from core.utils.cache import TTLCache
 from core.utils.crypto import AESCrypto, BaseCrypto
+from core.utils.executor import crypto_executor
 from core.dto import service
 
 
@@ -36,6 +43,11 @@ class UserAuthController(HTTPMethodView):
         session = await auth.create_session(user, request.headers.get("user-agent"), token_data)
         return generate_auth_resp(auth, session, token_data)
 
+    async def delete(self, request: Request) -> HTTPResponse:
+        auth: Auth = request.app.ctx.auth
+        session_id = await auth.close_session(request, SystemUserSession)
+        return json_response({"session": session_id})
+
 
 class CookiesStruct:
     token: str
@@ -57,13 +69,84 @@ class CookiesStruct:
         self.expire_at = datetime.strptime(self.cookies["expire_at"], self.time_format)
 
 
+class ScopeRegistry:
+    """
+    Role names interned to role ids, role with id N is bit N of a scopes mask.
+    Role ids that don't fit in the mask are checked as a set, bit 0 of a user mask tells the user has such roles
+    """
+    # scopes_mask is stored in a signed BIGINT column, role ids start at 1
+    MAX_ROLE_ID = 62
+    OVERFLOW_BIT = 1
+
+    _ids: Dict[str, list[int]]
+
+    def __init__(self):
+        self._ids = {}
+
+    async def load(self) -> None:
+        ids = {}
+        for role_id, name in await Role.all().values_list("id", "name"):
+            ids.setdefault(name, []).append(role_id)
+        self._ids = ids
+
+    @classmethod
+    def fits(cls, role_id: int) -> bool:
+        return 0 < role_id <= cls.MAX_ROLE_ID
+
+    @classmethod
+    def mask_of_ids(cls, role_ids: Iterable[int]) -> int:
+        mask = 0
+        for role_id in role_ids:
+            mask |= 1 << role_id if cls.fits(role_id) else cls.OVERFLOW_BIT
+        return mask
+
+    @classmethod
+    def overflow_ids(cls, role_ids: Iterable[int]) -> FrozenSet[int]:
+        return frozenset(role_id for role_id in role_ids if not cls.fits(role_id))
+
+    def scopes_of(self, names: Union[list[str], str]) -> Tuple[int, FrozenSet[int]]:
+        """Mask of the roles that fit in it and ids of the roles that don't"""
+        if isinstance(names, str):
+            names = [names]
+        role_ids = [role_id for name in names for role_id in self._ids.get(name, ())]
+        return self.mask_of_ids(role_ids) & ~self.OVERFLOW_BIT, self.overflow_ids(role_ids)
+
+
+class VerifiedSession:
+    __slots__ = ["session_id", "token_digest", "user", "payload", "scopes_mask", "overflow_role_ids"]
+
+    def __init__(self, session_id: int, token_digest: bytes, user: SystemUser, payload: Dict, scopes_mask: int,
+                 overflow_role_ids: FrozenSet[int] = frozenset()):
+        self.session_id = session_id
+        self.token_digest = token_digest
+        self.user = user
+        self.payload = payload
+        self.scopes_mask = scopes_mask
+        self.overflow_role_ids = overflow_role_ids
+
+
+# Sessions whose token already passed decryption, keyed by session id and checked against the token digest.
+# Logouts and user changes bump auth_version, so every worker drops its cache within settings.SHARED_STATE_MAX_AGE
+verified_sessions = TTLCache(maxsize=settings.AUTH_SESSION_CACHE_SIZE, ttl=settings.AUTH_SESSION_CACHE_TTL)
+auth_version = VersionStamp("auth", settings.SHARED_STATE_MAX_AGE)
+# Role changes bump roles_version, every worker reloads role ids and recompiles route masks
+roles_version = VersionStamp("roles", settings.SHARED_STATE_MAX_AGE)
+
+
 class Auth:
     _crypto_algorithm: BaseCrypto
+    _scopes: ScopeRegistry
     _default_expire_time: int
     _time_format = "%d-%m-%Y %H:%M:%S"
 
     def __init__(self, app: Sanic):
-        self._crypto_algorithm = AESCrypto(app.config.FORWARDED_SECRET)
+        key_id = settings.TOKEN_KEY_ID if settings.TOKEN_CRYPTO_MODE == "hkdf" else None
+        self._crypto_algorithm = AESCrypto(app.config.FORWARDED_SECRET,
+                                           key_id=key_id,
+                                           retired_key_ids=settings.TOKEN_RETIRED_KEY_IDS,
+                                           master_salt=settings.TOKEN_KDF_SALT)
+        self._scopes = ScopeRegistry()
+        self._app = app
 
     @property
     def time_format(self):
@@ -77,12 +160,13 @@ class Auth:
         user = await SystemUser.get_or_none(username=username).prefetch_related("scopes")
         if user is None or user.deleted:
             raise AuthenticationFailed(f"No user with username: {username}")
-        if not self._crypto_algorithm.verify_password(password, user.password, user.salt):
+        if not await crypto_executor.run("verify_password", self._crypto_algorithm.verify_password,
+                                         password, user.password, user.salt):
             raise AuthenticationFailed(f"Wrong password")
         return user
 
     async def generate_token(self, payload: str) -> AESCrypto.DataStruct:
-        return self._crypto_algorithm.encrypt(payload)
+        return await crypto_executor.run("encrypt_token", self._crypto_algorithm.encrypt, payload)
 
     @atomic()
     async def create_session(self, user: SystemUser, user_agent: str,
@@ -99,39 +183,104 @@ class Auth:
                                                  expire_time=expire_at,
                                                  salt=aes_token_data.salt,
                                                  nonce=aes_token_data.nonce,
-                                                 tag=aes_token_data.tag
+                                                 tag=aes_token_data.tag,
+                                                 scopes_mask=ScopeRegistry.mask_of_ids(i.id for i in user.scopes)
                                                  )
 
         return session
 
-    @atomic()
-    async def validate_request(self, request: Request, session_model: SystemUserSession) -> \
-            Tuple[SystemUserSession, Dict]:
+    async def validate_request(self, request: Request, session_model: SystemUserSession) -> VerifiedSession:
         if not request.cookies:
             raise AuthenticationFailed("Can't find cookies")
         cok = CookiesStruct(request.cookies, self._time_format)
-        session = await session_model.get_or_none(id=cok.session)
+        token_digest = hashlib.sha256(cok.token.encode()).digest()
+        if await roles_version.changed():
+            await self.compile_scopes(self._app)
+        if await auth_version.changed():
+            verified_sessions.clear()
+        verified: VerifiedSession = verified_sessions.get(cok.session)
+        if verified is not None and hmac.compare_digest(verified.token_digest, token_digest):
+            return verified
+        return await self._verify_session(cok, token_digest, session_model)
+
+    async def _verify_session(self, cok: CookiesStruct, token_digest: bytes,
+                              session_model: SystemUserSession) -> VerifiedSession:
+        session = await session_model.get_or_none(id=cok.session).select_related("user")
         if not session:
             raise AuthenticationFailed("Session not found, or already expired")
+        if session.logout_time is not None:
+            raise AuthenticationFailed("Session closed")
         if session.expire_time <= datetime.now(tz=pytz.UTC):
             raise AuthenticationFailed("Session expired")
         aes = AESCrypto.DataStruct(cok.token,
                                    session.salt,
                                    session.nonce,
                                    session.tag)
-        payload_str = self._crypto_algorithm.decrypt(aes)
+        try:
+            payload_str = await crypto_executor.run("decrypt_token", self._crypto_algorithm.decrypt, aes)
+        except (ValueError, KeyError):
+            raise AuthenticationFailed("Invalid token")
         payload = json.loads(payload_str)
-        user = await session.user.prefetch_related("scopes")
-        return user, payload
-
-    async def check_scopes(self, user_scopes: list[str], target_scopes: Union[list[str], str]) -> None:
-        if isinstance(target_scopes, list):
-            route_scope = set(target_scopes)
-        elif isinstance(target_scopes, str):
-            route_scope = {target_scopes}
+        user = session.user
+        if user is None or user.deleted:
+            raise AuthenticationFailed("User not found")
+        scopes_mask, overflow_role_ids = session.scopes_mask, frozenset()
+        if not scopes_mask or scopes_mask & ScopeRegistry.OVERFLOW_BIT:
+            # sessions opened before scopes_mask existed or with roles that don't fit in it
+            role_ids = await user.scopes.all().values_list("id", flat=True)
+            scopes_mask, overflow_role_ids = ScopeRegistry.mask_of_ids(role_ids), ScopeRegistry.overflow_ids(role_ids)
+        verified = VerifiedSession(session.id, token_digest, user, payload, scopes_mask, overflow_role_ids)
+        verified_sessions.set(session.id, verified, expire_at=session.expire_time.timestamp())
+        return verified
+
+    async def close_session(self, request: Request, session_model: SystemUserSession) -> int:
+        await self.validate_request(request, session_model)
+        session_id = int(request.cookies["session"])
+        async with in_transaction():
+            await session_model.filter(id=session_id).update(logout_time=datetime.now().astimezone())
+            await self.sessions_changed()
+        verified_sessions.pop(session_id)
+        return session_id
+
+    @staticmethod
+    async def sessions_changed() -> None:
+        """Call in the transaction that closes sessions or changes users, other workers drop their cached sessions"""
+        await auth_version.bump()
+
+    @staticmethod
+    def invalidate_user_sessions(user_id: int) -> None:
+        """Drop cached sessions of the user in this worker, call after the transaction has committed"""
+        verified_sessions.discard_where(lambda verified: verified.user.id == user_id)
+
+    @staticmethod
+    async def roles_changed() -> None:
+        """Call in the transaction that changes roles, every worker recompiles route masks and drops cached sessions"""
+        await roles_version.bump()
+        await auth_version.bump()
+
+    @staticmethod
+    def expire_roles() -> None:
+        """Apply a role change to this worker on its next request, call after the transaction has committed"""
+        roles_version.expire()
+        auth_version.expire()
+
+    async def compile_scopes(self, app: Sanic) -> None:
+        """Intern role names and precompute enabled_scopes_mask and enabled_role_ids of every protected view"""
+        await roles_version.sync()
+        await self._scopes.load()
+        for route in app.router.routes:
+            view_class = getattr(route.handler, "view_class", None)
+            if view_class is not None and hasattr(view_class, "enabled_scopes"):
+                view_class.enabled_scopes_mask, view_class.enabled_role_ids = \
+                    self._scopes.scopes_of(view_class.enabled_scopes)
+
+    def check_scopes(self, verified: VerifiedSession, view: HTTPMethodView) -> None:
+        route_mask = getattr(view, "enabled_scopes_mask", None)
+        if route_mask is None:
+            route_mask, route_role_ids = self._scopes.scopes_of(view.enabled_scopes)
         else:
-            raise ScopesFailed("Permission denied")
-        if not len(route_scope.intersection(user_scopes)) > 0:
+            route_role_ids = view.enabled_role_ids
+        if not verified.scopes_mask & route_mask and not verified.overflow_role_ids & route_role_ids:
             raise ScopesFailed("Permission denied")
 
 
@@ -139,6 +288,11 @@ def init_auth(app: Sanic):
     app.ctx.auth = Auth(app)
     app.add_route(UserAuthController.as_view(), "/auth")
 
+    async def compile_scopes(app, loop):
+        await app.ctx.auth.compile_scopes(app)
+
+    app.register_listener(compile_scopes, "before_server_start")
+
 
 def protect(retrive_user: bool = True):
     def called(method):
@@ -147,10 +301,11 @@ def protect(retrive_user: bool = True):
             cls = args[0]
             initial_args = args
             request = args[1]
-            user, payload = await request.app.ctx.auth.validate_request(request, SystemUserSession)
-            await request.app.ctx.auth.check_scopes([i.name for i in user.scopes], cls.enabled_scopes)
+            verified = await request.app.ctx.auth.validate_request(request, SystemUserSession)
+            request.app.ctx.auth.check_scopes(verified, cls)
             if retrive_user:
-                initial_args += (user,)
+                # the cached user is shared by concurrent requests, every request gets its own copy
+                initial_args += (copy(verified.user),)
             return await method(*initial_args, **kwargs)
 
         return f
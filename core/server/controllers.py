@@ -16,6 +16,8 @@ from application.access.base_access import BaseAccess
 from core.dto import validate, access
 from core.dto.access import EntityId
 from core.server.auth import protect
+from core.utils.pagination import PageParams
+from core.utils.projection import Projection
 
 
 class BaseAccessController(HTTPMethodView):
@@ -32,17 +34,21 @@ class BaseAccessController(HTTPMethodView):
 
     @protect(retrive_user=False)
     async def get(self, request: Request, entity: Optional[EntityId] = None) -> HTTPResponse:
+        target_model = self.access_type.target_model
+        projection = Projection.from_request(request, target_model)
+        access = request.app.ctx.access_registry.get(self.access_type)
         if entity is None:
-            limit = request.args.get("limit")
-            offset = request.args.get("offset")
-            limit = int(limit) if limit and limit.isdigit() else None
-            offset = int(offset) if offset and offset.isdigit() else None
-            models = await request.app.ctx.access_registry.get(self.access_type).read_all(limit, offset)
-            return json([await model.values_dict() for model in models])
-
-        model = await request.app.ctx.access_registry.get(self.access_type).read(entity)
+            page = PageParams.from_request(request)
+            models = await access.read_all(page.query_limit, page.offset, page.after_id, projection.columns)
+            models, next_cursor = page.split(models)
+            items = await target_model.bulk_values_dict(models, **projection.values_options())
+            if page.keyset:
+                return json({"items": items, "next_cursor": next_cursor})
+            return json(items)
+
+        model = await access.read(entity, projection.columns)
         if model:
-            return json(await model.values_dict())
+            return json(await model.values_dict(**projection.values_options()))
         else:
             raise NotFound()
 
@@ -0,0 +1,62 @@
+import time
+from datetime import datetime
+from typing import Optional
+
+from sanic import Sanic, Request, HTTPResponse
+from sanic.exceptions import NotFound
+from sanic.views import HTTPMethodView
+
+import settings
+from application.service.exports import EXPORTS, iterate_rows, to_ndjson, csv_header, csv_rows
+from core.errors.dto_error import DtoValidationError
+from core.server.auth import protect
+from core.utils.metrics import metrics
+
+_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _parse_date(request: Request, name: str) -> Optional[datetime]:
+    value = request.args.get(name)
+    if value is None:
+        return None
+    for date_format in (settings.ACCESS_DATETIME_FORMAT, settings.ACCESS_DATE_FORMAT):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise DtoValidationError(message=f"Query parameter {name} must be given in {settings.ACCESS_DATETIME_FORMAT} "
+                                     f"or {settings.ACCESS_DATE_FORMAT} format")
+
+
+class ExportController(HTTPMethodView):
+    """
+    Visit sessions, claims or blacklist entries as NDJSON or CSV (?format=), optionally within
+    [?from=, ?to=). Rows are streamed chunk by chunk as they are read.
+    """
+    enabled_scopes = ["root", "admin"]
+
+    @protect(retrive_user=False)
+    async def get(self, request: Request, entity: str) -> Optional[HTTPResponse]:
+        export = EXPORTS.get(entity)
+        if export is None:
+            raise NotFound()
+        file_format = request.args.get("format", "ndjson")
+        if file_format not in _CONTENT_TYPES:
+            raise DtoValidationError(message=f"Export format must be one of: {', '.join(_CONTENT_TYPES)}")
+        start, end = _parse_date(request, "from"), _parse_date(request, "to")
+
+        started, exported = time.perf_counter(), 0
+        response = await request.respond(content_type=_CONTENT_TYPES[file_format], headers={
+            "Content-Disposition": f'attachment; filename="{entity}.{file_format}"'})
+        if file_format == "csv":
+            await response.send(csv_header(export))
+        async for rows in iterate_rows(export, start, end, settings.EXPORT_CHUNK_SIZE):
+            await response.send(to_ndjson(rows) if file_format == "ndjson" else csv_rows(rows))
+            exported += len(rows)
+        await response.eof()
+        metrics.increment(f"export.{entity}.rows", exported)
+        metrics.observe(f"export.{entity}", time.perf_counter() - started)
+
+
+def init_exports(app: Sanic):
+    app.add_route(ExportController.as_view(), "/export/<entity:str>")
@@ -0,0 +1,94 @@
+import os
+
+import aiofiles
+from sanic import Sanic, Request, HTTPResponse
+from sanic import json as json_response
+from sanic.exceptions import NotFound, PayloadTooLarge
+from sanic.response import file_stream
+from sanic.views import HTTPMethodView, stream
+
+import settings
+from application.exceptions import InconsistencyError
+from application.service.import_jobs import visitor_imports
+from application.service.visitor import VisitorService
+from application.service.visitor_import import READERS
+from core.errors.dto_error import DtoValidationError
+from core.server.auth import protect
+from infrastructure.database.models import Claim, SystemUser, VisitorImport
+
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+}
+
+
+class VisitorImportController(HTTPMethodView):
+    """
+    Visitor list import: the body is a CSV or XLSX file (?format= or Content-Type), the header names
+    visitor fields and document fields as "passport.number". The file is imported in the background,
+    the response is the import job to poll.
+    """
+    enabled_scopes = ["root", "admin"]
+
+    @stream
+    @protect()
+    async def post(self, request: Request, system_user: SystemUser) -> HTTPResponse:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        file_format = request.args.get("format") or _CONTENT_TYPES.get(content_type)
+        if file_format not in READERS:
+            raise DtoValidationError(message=f"File format must be one of: {', '.join(READERS)}")
+        claim = request.args.get("claim")
+        if claim is not None and (not claim.isdigit() or not await Claim.exists(id=int(claim))):
+            raise InconsistencyError(message=f"Claim with id={claim} does not exist.")
+
+        job = await VisitorImport.create(filename=request.args.get("filename") or f"visitors.{file_format}",
+                                         file_format=file_format,
+                                         claim_id=int(claim) if claim is not None else None)
+        path = visitor_imports.upload_path(job)
+        size = 0
+        async with aiofiles.open(path, "wb") as file:
+            while True:
+                body = await request.stream.read()
+                if body is None:
+                    break
+                size += len(body)
+                if size > settings.VISITOR_IMPORT_MAX_SIZE:
+                    break
+                await file.write(body)
+        if size > settings.VISITOR_IMPORT_MAX_SIZE:
+            os.remove(path)
+            await VisitorImport.filter(id=job.id).update(status="failed", error="File is too large")
+            raise PayloadTooLarge(f"File is larger than {settings.VISITOR_IMPORT_MAX_SIZE} bytes")
+
+        visitor_imports.submit(job, request.app.ctx.service_registry.get(VisitorService))
+        return json_response(await job.values_dict(), status=202)
+
+
+class VisitorImportJobController(HTTPMethodView):
+    """Status and row counts of an import job"""
+    enabled_scopes = ["root", "admin"]
+
+    @protect(retrive_user=False)
+    async def get(self, request: Request, entity: int) -> HTTPResponse:
+        job = await VisitorImport.get_or_none(id=entity)
+        if job is None:
+            raise NotFound()
+        return json_response(await job.values_dict())
+
+
+class VisitorImportErrorsController(HTTPMethodView):
+    """Rows of an import that were not imported, CSV with row number and errors"""
+    enabled_scopes = ["root", "admin"]
+
+    @protect(retrive_user=False)
+    async def get(self, request: Request, entity: int) -> HTTPResponse:
+        path = visitor_imports.errors_path(entity)
+        if not os.path.exists(path):
+            raise NotFound()
+        return await file_stream(path, mime_type="text/csv", filename=f"import-{entity}-errors.csv")
+
+
+def init_imports(app: Sanic):
+    app.add_route(VisitorImportController.as_view(), "/visitors/import")
+    app.add_route(VisitorImportJobController.as_view(), "/visitors/import/<entity:int>")
+    app.add_route(VisitorImportErrorsController.as_view(), "/visitors/import/<entity:int>/errors")
@@ -0,0 +1,19 @@
+from sanic import Sanic, Request, HTTPResponse
+from sanic import json as json_response
+from sanic.views import HTTPMethodView
+
+from core.server.auth import protect
+from core.utils.metrics import metrics
+
+
+class MetricsController(HTTPMethodView):
+    """Metrics of the worker that served the request"""
+    enabled_scopes = ["root"]
+
+    @protect(retrive_user=False)
+    async def get(self, request: Request) -> HTTPResponse:
+        return json_response(metrics.snapshot())
+
+
+def init_internal(app: Sanic):
+    app.add_route(MetricsController.as_view(), "/internal/metrics")
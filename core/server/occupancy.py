@@ -0,0 +1,28 @@
+from sanic import Sanic, Request, HTTPResponse
+from sanic import json as json_response
+from sanic.views import HTTPMethodView
+
+from application.service.occupancy import occupancy
+from core.errors.dto_error import DtoValidationError
+from core.server.auth import protect
+
+
+class OccupancyController(HTTPMethodView):
+    """
+    Headcount for evacuation screens from the in-memory occupancy: visitors on site and per zone,
+    or visitors in one zone with ?zone=<id>. Every worker answers with counts at most settings.OCCUPANCY_MAX_AGE
+    seconds old
+    """
+    enabled_scopes = ["root", "admin", "security_officer"]
+
+    @protect(retrive_user=False)
+    async def get(self, request: Request) -> HTTPResponse:
+        zone = request.args.get("zone")
+        if zone is not None and not zone.isdigit():
+            raise DtoValidationError(message="Query parameter zone must be an integer")
+        await occupancy.ensure_fresh()
+        return json_response(occupancy.snapshot(None if zone is None else int(zone)))
+
+
+def init_occupancy(app: Sanic):
+    app.add_route(OccupancyController.as_view(), "/occupancy")
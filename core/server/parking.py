@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sanic import Sanic, Request, HTTPResponse
+from sanic import json as json_response
+from sanic.views import HTTPMethodView
+
+import settings
+from application.service.parking import parking_availability
+from core.dto import validate
+from core.dto.service import ParkingReservationDto
+from core.errors.dto_error import DtoValidationError
+from core.server.auth import protect
+from infrastructure.database.models import ParkingReservation
+
+
+def _parse_datetime(value, name: str) -> datetime:
+    try:
+        return datetime.strptime(value, settings.ACCESS_DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        raise DtoValidationError(message=f"{name} must be given in {settings.ACCESS_DATETIME_FORMAT} format")
+
+
+class ParkingAvailabilityController(HTTPMethodView):
+    """Free parking places for ?start=&end=, at most ?count= of them, from the in-memory index"""
+    enabled_scopes = ["root", "admin"]
+
+    @protect(retrive_user=False)
+    async def get(self, request: Request) -> HTTPResponse:
+        start = _parse_datetime(request.args.get("start"), "start")
+        end = _parse_datetime(request.args.get("end"), "end")
+        count = request.args.get("count")
+        if count is not None and (not count.isdigit() or int(count) == 0):
+            raise DtoValidationError(message="Query parameter count must be a positive integer")
+        await parking_availability.ensure_loaded()
+        return json_response(parking_availability.free_places(start, end, None if count is None else int(count)))
+
+
+class ParkingReservationController(HTTPMethodView):
+    """Reserve given parking places or any count of free ones for a group"""
+    enabled_scopes = ["root", "admin"]
+
+    @protect(retrive_user=False)
+    async def post(self, request: Request) -> HTTPResponse:
+        dto = validate(ParkingReservationDto.CreationDto, request)
+        reservations = await parking_availability.reserve(_parse_datetime(dto.start, "start"),
+                                                          _parse_datetime(dto.end, "end"),
+                                                          places=dto.places, count=dto.count,
+                                                          transport=dto.transport)
+        return json_response(await ParkingReservation.bulk_values_dict(reservations))
+
+
+class ParkingReservationReleaseController(HTTPMethodView):
+    """Release a parking reservation"""
+    enabled_scopes = ["root", "admin"]
+
+    @protect(retrive_user=False)
+    async def delete(self, request: Request, entity: int) -> HTTPResponse:
+        return json_response(await parking_availability.release(entity))
+
+
+def init_parking(app: Sanic):
+    app.add_route(ParkingAvailabilityController.as_view(), "/parking/availability")
+    app.add_route(ParkingReservationController.as_view(), "/parking/reservations")
+    app.add_route(ParkingReservationReleaseController.as_view(), "/parking/reservations/<entity:int>")
@@ -11,6 +11,7 @@ from core.dto import validate
 from core.dto.access import EntityId
 from core.dto.service import (ClaimDto,
                               VisitorDto,
+                              VisitorBulkDto,
                               PassportDto,
                               MilitaryIdDto,
                               VisitSessionDto,
@@ -40,6 +41,8 @@ from application.service.visitor import (VisitorService,
                                          PassService,
                                          TransportService)
 from core.server.auth import protect
+from core.utils.pagination import PageParams
+from core.utils.projection import Projection
 
 
 class BaseServiceController(HTTPMethodView):
@@ -56,17 +59,21 @@ class BaseServiceController(HTTPMethodView):
 
     @protect(retrive_user=False)
     async def get(self, request: Request, entity_id: Optional[EntityId] = None) -> HTTPResponse:
+        target_model = self.target_service.target_model
+        projection = Projection.from_request(request, target_model)
+        service = request.app.ctx.service_registry.get(self.target_service)
         if entity_id is None:
-            limit = request.args.get("limit")
-            offset = request.args.get("offset")
-            limit = int(limit) if limit and limit.isdigit() else None
-            offset = int(offset) if offset and offset.isdigit() else None
-            models = await request.app.ctx.service_registry.get(self.target_service).read_all(limit, offset)
-            return json([await model.values_dict() for model in models])
-
-        model = await request.app.ctx.service_registry.get(self.target_service).read(entity_id)
+            page = PageParams.from_request(request)
+            models = await service.read_all(page.query_limit, page.offset, page.after_id, projection.columns)
+            models, next_cursor = page.split(models)
+            items = await target_model.bulk_values_dict(models, **projection.values_options())
+            if page.keyset:
+                return json({"items": items, "next_cursor": next_cursor})
+            return json(items)
+
+        model = await service.read(entity_id, projection.columns)
         if model:
-            return json(await model.values_dict())
+            return json(await model.values_dict(**projection.values_options()))
         else:
             raise NotFound()
 
@@ -126,6 +133,18 @@ class VisitorController:
         put_dto = VisitorDto.UpdateDto
         target_service = VisitorService
 
+    class BulkCreate(BaseServiceController):
+        enabled_scopes = ["root", "admin"]
+        target_route = "/visitors/bulk"
+        post_dto = VisitorBulkDto.CreationDto
+        target_service = VisitorService
+
+        @protect()
+        async def post(self, request: Request, system_user: SystemUser) -> HTTPResponse:
+            dto = self.validate(self.post_dto, request)
+            service_name: VisitorService = request.app.ctx.service_registry.get(self.target_service)
+            return json(await service_name.bulk_create(system_user, dto))
+
 
 class PassportController:
     returned_model = Passport
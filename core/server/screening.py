@@ -0,0 +1,30 @@
+from sanic import Sanic, Request, HTTPResponse
+from sanic import json as json_response
+from sanic.views import HTTPMethodView
+
+from application.service.black_list_index import black_list_index
+from core.dto import validate
+from core.dto.service import BlackListDto
+from core.server.auth import protect
+
+
+class BlackListScreenController(HTTPMethodView):
+    """
+    Bulk screening against the in-memory blacklist index: visitors given in the body
+    and/or every visitor of a claim, by visitor id and document numbers
+    """
+    enabled_scopes = ["root", "admin", "security_officer"]
+
+    @protect(retrive_user=False)
+    async def post(self, request: Request) -> HTTPResponse:
+        dto = validate(BlackListDto.ScreenDto, request)
+        items = [item.dict() for item in dto.visitors or ()]
+        if dto.claim is not None:
+            items += await black_list_index.claim_visitors(dto.claim)
+        results = await black_list_index.screen_many(items)
+        return json_response([{"visitor": item.get("visitor"), "in_black_list": bool(matches), "matches": matches}
+                              for item, matches in zip(items, results)])
+
+
+def init_screening(app: Sanic):
+    app.add_route(BlackListScreenController.as_view(), "/blacklist/screen")
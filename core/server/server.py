@@ -3,21 +3,42 @@ from pyee.asyncio import AsyncIOEventEmitter
 from loguru import logger
 from sanic import Sanic
 from sanic_cors import CORS
+from tortoise import Tortoise
 from tortoise.contrib.sanic import register_tortoise
 
 import settings
 from application.service.service_registry import ServiceRegistry
 from application.access.access_registry import AccessRegistry
+from application.service.black_list_index import black_list_index
+from application.service.import_jobs import visitor_imports
+from application.service.occupancy import occupancy
+from application.service.parking import parking_availability
+from application.service.pass_index import pass_index
 from config.config import ConfPD
 from core.server.routes import BaseServiceController
 from core.utils.loggining import LogsHandler
 from core.errors.error_handler import ExtendedErrorHandler
 from core.server.auth import init_auth
+from core.server.exports import init_exports
+from core.server.imports import init_imports
+from core.server.internal import init_internal
+from core.server.occupancy import init_occupancy
+from core.server.parking import init_parking
+from core.server.screening import init_screening
+from core.server.turnstile import init_turnstile
 from core.server.controllers import BaseAccessController
 from core.communication.celery.celery_ import celery
-from core.communication.celery.watcher import CeleryEventWatcher
-from infrastructure.database.connection import sample_conf, init_database_conn
+from core.communication.celery.dispatcher import dispatcher
+from core.communication.celery.relay import OutboxRelay
+from core.plugins.executor import plugin_executor
+from core.plugins.registry import plugin_registry
+from core.utils.executor import crypto_executor
+from core.utils.serialization import dumps
+from infrastructure.database.connection import sample_conf, init_database_conn, create_replica_client
+from infrastructure.database.layer import DbLayer
+from infrastructure.database.metadata import build_metadata
 from infrastructure.database.init_db import setup_db
+from infrastructure.database.serializers import compile_serializers
 
 
 class Server:
@@ -26,7 +47,7 @@ class Server:
     def __init__(self, conf: ConfPD):
         self.emitter = AsyncIOEventEmitter()
         self.conf = conf
-        self.sanic_app = Sanic('app')
+        self.sanic_app = Sanic('app', dumps=dumps)
         LogsHandler.setup_loggers()
         self._setup()
         self._set_listeners()
@@ -41,6 +62,10 @@ class Server:
             conn = await init_database_conn()
             await setup_db(conn)
             await conn.close()
+            # setup_db closes the ORM connections after migrating, jobs are recovered over new ones
+            await init_database_conn()
+            await visitor_imports.recover()
+            await Tortoise.close_connections()
 
         loop = asyncio.get_event_loop()
         loop.run_until_complete(_set_db())
@@ -53,23 +78,64 @@ class Server:
         self.sanic_app.error_handler = ExtendedErrorHandler()
 
     async def setup_worker_context(self, app, loop):
-        CeleryEventWatcher(celery, self.emitter)
+        app.ctx.outbox_relay = OutboxRelay(settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL,
+                                            settings.OUTBOX_LEASE)
         app.ctx.service_registry = ServiceRegistry(self.emitter)
         app.ctx.access_registry = AccessRegistry()
+        DbLayer.replica = create_replica_client()
+
+    async def teardown_worker_context(self, app, loop):
+        await visitor_imports.stop()
+        await app.ctx.outbox_relay.stop(settings.OUTBOX_DRAIN_TIMEOUT)
+        dispatcher.shutdown()
+        crypto_executor.shutdown()
+        await plugin_registry.stop()
+        await black_list_index.stop()
+        await pass_index.stop()
+        await parking_availability.stop()
+        plugin_executor.shutdown()
+        if DbLayer.replica is not None:
+            await DbLayer.replica.close()
+
+    @staticmethod
+    async def setup_orm_context(app, loop):
+        build_metadata()
+        compile_serializers()
+        app.ctx.outbox_relay.start()
+        await black_list_index.start()
+        await pass_index.start()
+        await occupancy.start()
+        await parking_availability.start()
+        await plugin_registry.refresh()
+        plugin_registry.start()
+
+    @staticmethod
+    async def route_reads(request):
+        DbLayer.read_your_writes(request.headers.get(settings.READ_YOUR_WRITES_HEADER) == "1")
 
     # def _start_celery(self, app, loop):
     #     celery.start(settings.CELERY_STARTUP_PARAMS)
 
     def _set_listeners(self):
         self.sanic_app.register_listener(self.setup_worker_context, "before_server_start")
+        self.sanic_app.register_listener(self.teardown_worker_context, "after_server_stop")
         # self.sanic_app.register_listener(self._start_celery, "after_server_start")
         register_tortoise(self.sanic_app, sample_conf)
+        self.sanic_app.register_listener(self.setup_orm_context, "before_server_start")
+        self.sanic_app.register_middleware(self.route_reads, "request")
 
     def _init_extentions(self):
         CORS(self.sanic_app)
 
     def _register_api(self):
         init_auth(self.sanic_app)
+        init_internal(self.sanic_app)
+        init_screening(self.sanic_app)
+        init_turnstile(self.sanic_app)
+        init_occupancy(self.sanic_app)
+        init_parking(self.sanic_app)
+        init_imports(self.sanic_app)
+        init_exports(self.sanic_app)
 
         for controller in BaseServiceController.__subclasses__():
             self.sanic_app.add_route(controller.as_view(), controller.target_route)
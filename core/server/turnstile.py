@@ -0,0 +1,53 @@
+import hashlib
+import hmac
+import time
+
+from sanic import Sanic, Request, HTTPResponse
+from sanic import json as json_response
+from sanic.views import HTTPMethodView
+
+import settings
+from application.service.pass_index import pass_index
+from core.errors.auth_errors import AuthenticationFailed
+from core.errors.dto_error import DtoValidationError
+from core.utils.metrics import metrics
+
+_DEVICE_KEYS = tuple(hashlib.sha256(key.encode()).digest() for key in settings.DEVICE_KEYS)
+
+
+def check_device_key(request: Request) -> None:
+    key = request.headers.get(settings.DEVICE_KEY_HEADER)
+    if not key:
+        raise AuthenticationFailed("Device key is missing")
+    digest = hashlib.sha256(key.encode()).digest()
+    # every key is compared, so the response time does not tell which one was close
+    if not sum(hmac.compare_digest(digest, device_key) for device_key in _DEVICE_KEYS):
+        raise AuthenticationFailed("Unknown device key")
+
+
+def _int_arg(request: Request, name: str) -> int:
+    try:
+        return int(request.args.get(name))
+    except (TypeError, ValueError):
+        raise DtoValidationError(message=f"Query parameter {name} must be an integer")
+
+
+class AccessDecisionController(HTTPMethodView):
+    """
+    Decision for a turnstile reader: may the pass with rfid enter the zone.
+    Answered from the in-memory pass index, readers authenticate with a device key instead of a session.
+    """
+
+    async def get(self, request: Request) -> HTTPResponse:
+        start = time.perf_counter()
+        check_device_key(request)
+        rfid, zone = _int_arg(request, "rfid"), _int_arg(request, "zone")
+        await pass_index.ensure_loaded()
+        allow, reason, pass_id = pass_index.decide(rfid, zone)
+        metrics.increment("access.allowed" if allow else "access.denied")
+        metrics.observe("access.decision", time.perf_counter() - start)
+        return json_response({"allow": allow, "reason": reason, "pass": pass_id})
+
+
+def init_turnstile(app: Sanic):
+    app.add_route(AccessDecisionController.as_view(), "/access/decision")
@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """In-process LRU cache with per-entry expiration"""
+    __slots__ = ("_data", "_maxsize", "_ttl")
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._data: OrderedDict = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expire_at, value = item
+        if expire_at <= time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expire_at: Optional[float] = None) -> None:
+        """
+        Store value until now + ttl, or until expire_at (unix timestamp) if it comes earlier.
+        Least recently used entries are evicted when the cache is full.
+        """
+        deadline = time.time() + self._ttl
+        if expire_at is not None:
+            deadline = min(deadline, expire_at)
+        self._data[key] = (deadline, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches predicate, returns number of dropped entries"""
+        keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -4,10 +4,12 @@ import random
 import string
 import sys
 from base64 import b64encode, b64decode
-from typing import Iterable
+from typing import Iterable, Optional, Set, Dict
 from uuid import uuid4
 
 from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
 from Crypto.Random import get_random_bytes
 
 
@@ -38,15 +40,19 @@ class BaseCrypto:
 
 class AESCrypto(BaseCrypto):
     class DataStruct:
-        __slots__ = ["cipher_text", "salt", "nonce", "tag"]
+        __slots__ = ["cipher_text", "salt", "nonce", "tag", "key_id"]
 
-        def __init__(self, cipher_text, salt, nonce, tag):
+        def __init__(self, cipher_text, salt, nonce, tag, key_id=None):
             self.cipher_text = cipher_text
             self.salt = salt
             self.nonce = nonce
             self.tag = tag
+            self.key_id = key_id
 
         def decode(self):
+            if self.cipher_text.startswith(AESCrypto.TOKEN_PREFIX):
+                _, key_id, self.cipher_text = self.cipher_text.split(".", 2)
+                self.key_id = int(key_id)
             for var, val in self.__dict__().items():
                 setattr(self, var, b64decode(val))
 
@@ -54,6 +60,8 @@ class AESCrypto(BaseCrypto):
             encoding = sys.getdefaultencoding()
             for var, val in self.__dict__().items():
                 setattr(self, var, b64encode(val).decode(encoding))
+            if self.key_id is not None:
+                self.cipher_text = f"{AESCrypto.TOKEN_PREFIX}{self.key_id}.{self.cipher_text}"
 
         def __dict__(self):
             return {"cipher_text": self.cipher_text,
@@ -64,36 +72,73 @@ class AESCrypto(BaseCrypto):
         def __str__(self):
             return "\n".join([f"{k} : {v}" for k, v in self.__dict__().items()])
 
+    # Tokens of the keyed format look like "v2.<key id>.<cipher text>", anything else is a legacy per-token scrypt one
+    TOKEN_PREFIX = "v2."
+
     _data_password: str
     _n_factor: int
     _block_size: int
     _threads_num: int
     _key_len: int
-
-    def __init__(self, secret: str):
+    _key_id: Optional[int]
+    _accepted_key_ids: Set[int]
+    _master_key: Optional[bytes]
+    _subkeys: Dict[int, bytes]
+
+    def __init__(self, secret: str, key_id: Optional[int] = None, retired_key_ids: Iterable[int] = (),
+                 master_salt: str = None):
+        """
+        :param secret: password every key is derived from
+        :param key_id: id of the HKDF subkey for new tokens, None keeps the legacy per-token scrypt mode
+        :param retired_key_ids: ids of subkeys still accepted for validation while their tokens age out
+        :param master_salt: salt of the master key scrypt derivation
+        """
         super(AESCrypto, self).__init__()
         self._data_password = secret
         self._n_factor = 2 ** 14
         self._block_size = 8
         self._threads_num = 1
         self._key_len = 32
-
-    def encrypt(self, plain_text: str) -> DataStruct:
-        salt = get_random_bytes(AES.block_size)
-        private_key = hashlib.scrypt(
+        self._key_id = key_id
+        self._accepted_key_ids = set(retired_key_ids)
+        self._master_key = None
+        self._subkeys = {}
+        if key_id is not None:
+            self._accepted_key_ids.add(key_id)
+            self._master_key = self._derive_key(master_salt.encode())
+            for accepted_key_id in self._accepted_key_ids:
+                self._subkeys[accepted_key_id] = HKDF(self._master_key, self._key_len, b"", SHA256,
+                                                      context=f"asbp-token-{accepted_key_id}".encode())
+
+    def _derive_key(self, salt: bytes) -> bytes:
+        return hashlib.scrypt(
             self._data_password.encode(), salt=salt, n=self._n_factor, r=self._block_size, p=self._threads_num,
             dklen=self._key_len)
-        cipher_config = AES.new(private_key, AES.MODE_GCM)
+
+    @staticmethod
+    def _associated_data(key_id: int) -> bytes:
+        return f"{AESCrypto.TOKEN_PREFIX}{key_id}".encode()
+
+    def encrypt(self, plain_text: str) -> DataStruct:
+        if self._key_id is None:
+            salt = get_random_bytes(AES.block_size)
+            cipher_config = AES.new(self._derive_key(salt), AES.MODE_GCM)
+        else:
+            salt = b""
+            cipher_config = AES.new(self._subkeys[self._key_id], AES.MODE_GCM)
+            cipher_config.update(self._associated_data(self._key_id))
         cipher_text, tag = cipher_config.encrypt_and_digest(bytes(plain_text, sys.getdefaultencoding()))
-        return AESCrypto.DataStruct(cipher_text, salt, cipher_config.nonce, tag)
+        return AESCrypto.DataStruct(cipher_text, salt, cipher_config.nonce, tag, self._key_id)
 
     def decrypt(self, aes_struct: DataStruct) -> str:
         aes_struct.decode()
-        private_key = hashlib.scrypt(
-            self._data_password.encode(), salt=aes_struct.salt, n=self._n_factor, r=self._block_size,
-            p=self._threads_num,
-            dklen=self._key_len)
-        cipher = AES.new(private_key, AES.MODE_GCM, nonce=aes_struct.nonce)
+        if aes_struct.key_id is None:
+            cipher = AES.new(self._derive_key(aes_struct.salt), AES.MODE_GCM, nonce=aes_struct.nonce)
+        else:
+            if aes_struct.key_id not in self._subkeys:
+                raise ValueError(f"Token key id {aes_struct.key_id} is not accepted")
+            cipher = AES.new(self._subkeys[aes_struct.key_id], AES.MODE_GCM, nonce=aes_struct.nonce)
+            cipher.update(self._associated_data(aes_struct.key_id))
         decrypted = cipher.decrypt_and_verify(aes_struct.cipher_text, aes_struct.tag)
         return decrypted
 
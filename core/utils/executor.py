@@ -0,0 +1,63 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+import settings
+from core.errors.overload_error import ServiceOverloaded
+from core.utils.metrics import metrics
+
+
+class CryptoExecutor:
+    """
+    Bounded pool for CPU heavy crypto (password hashing, token KDF and AES).
+    Calls beyond max_workers + max_queue are rejected instead of piling up on the event loop.
+    """
+    __slots__ = ("_kind", "_max_workers", "_max_queue", "_pending", "_pool", "_pid")
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int):
+        self._kind = kind
+        self._max_workers = max_workers
+        self._max_queue = max_queue
+        self._pending = 0
+        self._pool: Optional[Executor] = None
+        self._pid: Optional[int] = None
+
+    def _get_pool(self) -> Executor:
+        # pool is created lazily so every forked Sanic worker gets its own one
+        if self._pool is None or self._pid != os.getpid():
+            if self._kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self._max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="crypto")
+            self._pid = os.getpid()
+        return self._pool
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, operation: str, func: Callable, *args, **kwargs) -> Any:
+        if self._pending >= self._max_workers + self._max_queue:
+            metrics.increment(f"crypto.{operation}.rejected")
+            raise ServiceOverloaded("Too many concurrent crypto operations, try again later")
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), partial(func, *args, **kwargs))
+        finally:
+            self._pending -= 1
+            metrics.observe(f"crypto.{operation}", time.perf_counter() - start)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+crypto_executor = CryptoExecutor(settings.CRYPTO_EXECUTOR_KIND,
+                                 settings.CRYPTO_EXECUTOR_WORKERS,
+                                 settings.CRYPTO_EXECUTOR_MAX_QUEUE)
+metrics.register_gauge("crypto_executor.pending", lambda: crypto_executor.pending)
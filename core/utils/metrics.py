@@ -0,0 +1,73 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Union
+
+
+class LatencyStat:
+    """Latency of an operation, keeps totals and a window of the latest samples for percentiles"""
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, rank: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * rank))]
+
+    def to_dict(self) -> dict:
+        return {"count": self.count,
+                "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+                "p50_ms": round(self.percentile(0.5) * 1000, 3),
+                "p99_ms": round(self.percentile(0.99) * 1000, 3),
+                "max_ms": round(self.max * 1000, 3)}
+
+
+class Metrics:
+    """In-memory metrics of the current worker"""
+    __slots__ = ("_latencies", "_counters", "_gauges")
+
+    def __init__(self):
+        self._latencies: Dict[str, LatencyStat] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Callable[[], Union[int, float, dict]]] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        stat = self._latencies.get(name)
+        if stat is None:
+            stat = self._latencies[name] = LatencyStat()
+        stat.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, getter: Callable[[], Union[int, float, dict]]) -> None:
+        """getter is called on every snapshot, so it should only read already collected values"""
+        self._gauges[name] = getter
+
+    def snapshot(self) -> dict:
+        return {"latency": {name: stat.to_dict() for name, stat in self._latencies.items()},
+                "counters": dict(self._counters),
+                "gauges": {name: getter() for name, getter in self._gauges.items()}}
+
+
+metrics = Metrics()
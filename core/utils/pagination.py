@@ -0,0 +1,67 @@
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from binascii import Error as BinasciiError
+from typing import List, Optional, Tuple
+
+from sanic import Request
+
+import settings
+from core.errors.dto_error import DtoValidationError
+
+
+class Cursor:
+    """Opaque keyset cursor, points right after the last returned id"""
+
+    @staticmethod
+    def encode(last_id: int) -> str:
+        return urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+    @staticmethod
+    def decode(cursor: str) -> int:
+        try:
+            last_id = json.loads(urlsafe_b64decode(cursor.encode()))["id"]
+        except (BinasciiError, ValueError, KeyError, TypeError):
+            raise DtoValidationError(message="Invalid cursor")
+        if not isinstance(last_id, int):
+            raise DtoValidationError(message="Invalid cursor")
+        return last_id
+
+
+class PageParams:
+    """
+    List query params. ?cursor (empty for the first page) switches to keyset pagination,
+    otherwise limit/offset is used. Page size is always capped by settings.PAGE_MAX_SIZE.
+    """
+    __slots__ = ("limit", "offset", "after_id", "keyset")
+
+    def __init__(self, limit: int, offset: Optional[int] = None, after_id: Optional[int] = None,
+                 keyset: bool = False):
+        self.limit = limit
+        self.offset = offset
+        self.after_id = after_id
+        self.keyset = keyset
+
+    @classmethod
+    def from_request(cls, request: Request) -> "PageParams":
+        args = request.get_args(keep_blank_values=True)
+        limit = args.get("limit")
+        limit = int(limit) if limit and limit.isdigit() else None
+        limit = min(limit or settings.PAGE_MAX_SIZE, settings.PAGE_MAX_SIZE)
+        if "cursor" in args:
+            cursor = args.get("cursor")
+            return cls(limit, after_id=Cursor.decode(cursor) if cursor else None, keyset=True)
+        offset = args.get("offset")
+        offset = int(offset) if offset and offset.isdigit() else None
+        return cls(limit, offset=offset)
+
+    @property
+    def query_limit(self) -> int:
+        """One extra row in keyset mode tells whether there is a next page"""
+        return self.limit + 1 if self.keyset else self.limit
+
+    def split(self, models: List) -> Tuple[List, Optional[str]]:
+        """Cut the extra row off and build next_cursor"""
+        if not self.keyset or len(models) <= self.limit:
+            return models, None
+        models = models[:self.limit]
+        return models, Cursor.encode(models[-1].id)
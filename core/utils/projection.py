@@ -0,0 +1,57 @@
+from typing import Iterable, Optional, Type
+
+from sanic import Request
+
+from core.errors.dto_error import DtoValidationError
+from infrastructure.database.metadata import get_metadata
+from infrastructure.database.models import AbstractBaseModel
+
+
+class Projection:
+    """
+    ?fields=name,zone,... query param. Requested columns are pushed down into .only(),
+    relations are loaded and serialized only when requested. No param means the full entity.
+    """
+    __slots__ = ("columns", "fk_fields", "m2m_fields", "hidden")
+
+    def __init__(self, columns: Optional[tuple[str, ...]] = None, fk_fields: tuple[str, ...] = (),
+                 m2m_fields: tuple[str, ...] = (), hidden: tuple[str, ...] = ()):
+        self.columns = columns
+        self.fk_fields = fk_fields
+        self.m2m_fields = m2m_fields
+        self.hidden = hidden
+
+    @property
+    def full(self) -> bool:
+        return self.columns is None
+
+    @classmethod
+    def from_request(cls, request: Request, model: Type[AbstractBaseModel]) -> "Projection":
+        fields = request.args.get("fields")
+        if not fields:
+            return cls()
+        return cls.parse(model, fields.split(","))
+
+    @classmethod
+    def parse(cls, model: Type[AbstractBaseModel], names: Iterable[str]) -> "Projection":
+        metadata = get_metadata(model)
+        columns, fk_fields, m2m_fields, hidden = {"id": None}, [], [], []
+        for name in filter(None, (name.strip() for name in names)):
+            if name in metadata.columns:
+                columns[name] = None
+            elif name in metadata.fk_fields:
+                fk_fields.append(name)
+                source_field = model._meta.fields_map[name].source_field
+                if source_field not in columns:
+                    hidden.append(source_field)
+            elif name in metadata.m2m_fields or name in metadata.backward_fields:
+                m2m_fields.append(name)
+            else:
+                raise DtoValidationError(message=f"Unknown field: {name}")
+        hidden = tuple(dict.fromkeys(field for field in hidden if field not in columns))
+        return cls(tuple(columns) + hidden, tuple(dict.fromkeys(fk_fields)), tuple(dict.fromkeys(m2m_fields)),
+                   hidden)
+
+    def values_options(self) -> dict:
+        """Keyword arguments for values_dict/bulk_values_dict"""
+        return {"fk_fields": self.fk_fields, "m2m_fields": self.m2m_fields, "drop_cols": list(self.hidden)}
@@ -0,0 +1,8 @@
+import orjson
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj, **kwargs) -> bytes:
+    """Encode responses with orjson, datetime and uuid are supported natively"""
+    return orjson.dumps(obj, option=_OPTIONS)
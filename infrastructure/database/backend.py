@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import Optional
+
+import asyncpg
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+
+from core.errors.overload_error import ServiceOverloaded
+from core.utils.metrics import metrics
+
+
+class _PoolAcquire:
+    """Both awaitable and async context manager, like asyncpg's own PoolAcquireContext"""
+    __slots__ = ("_pool", "_timeout", "_connection")
+
+    def __init__(self, pool: "InstrumentedPool", timeout: Optional[float]):
+        self._pool = pool
+        self._timeout = timeout
+        self._connection = None
+
+    def __await__(self):
+        return self._pool._acquire(self._timeout).__await__()
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self._connection = await self._pool._acquire(self._timeout)
+        return self._connection
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self._pool.release(self._connection)
+
+
+class InstrumentedPool:
+    """asyncpg pool proxy which counts connections in use, acquire waiters and acquire latency"""
+
+    def __init__(self, pool: asyncpg.Pool, name: str, acquire_timeout: Optional[float] = None):
+        self._pool = pool
+        self._name = name
+        self._acquire_timeout = acquire_timeout
+        self.in_use = 0
+        self.waiting = 0
+        self.timeouts = 0
+
+    def __getattr__(self, item):
+        return getattr(self._pool, item)
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _PoolAcquire:
+        return _PoolAcquire(self, timeout if timeout is not None else self._acquire_timeout)
+
+    async def _acquire(self, timeout: Optional[float]) -> asyncpg.Connection:
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ServiceOverloaded(f"No free database connection in {timeout} seconds")
+        finally:
+            self.waiting -= 1
+            metrics.observe(f"db.{self._name}.acquire", time.perf_counter() - start)
+        self.in_use += 1
+        return connection
+
+    async def release(self, connection: asyncpg.Connection, *, timeout: Optional[float] = None) -> None:
+        self.in_use -= 1
+        await self._pool.release(connection, timeout=timeout)
+
+    def stats(self) -> dict:
+        return {"size": self._pool.get_size(),
+                "idle": self._pool.get_idle_size(),
+                "min_size": self._pool.get_min_size(),
+                "max_size": self._pool.get_max_size(),
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "acquire_timeouts": self.timeouts}
+
+
+class InstrumentedAsyncpgDBClient(AsyncpgDBClient):
+    """Tortoise asyncpg client whose pool reports its usage to core.utils.metrics"""
+
+    async def create_pool(self, **kwargs) -> InstrumentedPool:
+        acquire_timeout = kwargs.pop("acquire_timeout", None)
+        pool = InstrumentedPool(await super().create_pool(**kwargs), self.connection_name, acquire_timeout)
+        metrics.register_gauge(f"db.{self.connection_name}.pool", pool.stats)
+        return pool
+
+
+client_class = InstrumentedAsyncpgDBClient
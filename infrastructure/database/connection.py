@@ -1,12 +1,14 @@
+from typing import Optional
 from tortoise import Tortoise, BaseDBAsyncClient
 
 import settings
+from infrastructure.database.backend import client_class
 
 
 sample_conf = {
     'connections': {
         'default': {
-            'engine': 'tortoise.backends.asyncpg',
+            'engine': 'infrastructure.database.backend',
 
             'credentials': {
                 'host': settings.DB_HOST,
@@ -15,8 +17,11 @@ sample_conf = {
                 'password': settings.DB_PASSWORD,
                 'database': settings.DB_NAME,
                 'schema': 'asbp',
-                'minsize': 1,
-                'maxsize': 3,
+                'minsize': settings.DB_POOL_MINSIZE,
+                'maxsize': settings.DB_POOL_MAXSIZE,
+                'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+                'max_inactive_connection_lifetime': settings.DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+                'acquire_timeout': settings.DB_POOL_ACQUIRE_TIMEOUT,
             },
 
         }
@@ -32,6 +37,23 @@ sample_conf = {
     'timezone': 'UTC'
 }
 
+replica_credentials = None
+if settings.DB_REPLICA_HOST:
+    replica_credentials = {**sample_conf['connections']['default']['credentials'],
+                           'host': settings.DB_REPLICA_HOST,
+                           'port': settings.DB_REPLICA_PORT}
+
+
+def create_replica_client() -> Optional[BaseDBAsyncClient]:
+    """
+    Replica client is kept out of sample_conf: with a second connection in the config
+    atomic() without connection_name could not pick the database anymore.
+    The pool is created lazily on the first query.
+    """
+    if replica_credentials is None:
+        return None
+    return client_class(connection_name="replica", **replica_credentials)
+
 
 async def init_database_conn() -> BaseDBAsyncClient:
     # TODO: Add docks
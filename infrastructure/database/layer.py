@@ -1,11 +1,14 @@
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Type, List, Union
+from typing import Type, List, Union, Optional, Sequence
+from tortoise import BaseDBAsyncClient, connections
+from tortoise.backends.base.client import BaseTransactionWrapper
 from tortoise.expressions import Q
 from tortoise.fields import Field
-from tortoise.fields.relational import RelationalField
 from tortoise.queryset import QuerySetSingle, QuerySet
 
 from core.dto.access import EntityId
+from infrastructure.database.metadata import get_metadata
 from infrastructure.database.models import SystemUserSession, SystemUser, AbstractBaseModel
 
 
@@ -87,14 +90,32 @@ class SystemUserDbLayer:
         await SystemUser.filter(id=user_id).update(last_logout=time)
 
 
+_read_your_writes: ContextVar[bool] = ContextVar("read_your_writes", default=False)
+
+
 class DbLayer(SystemUserDbLayer):
+    PRIMARY_CONNECTION = "default"
+    replica: Optional[BaseDBAsyncClient] = None
+
     def __init__(self):
         pass
 
+    @staticmethod
+    def read_your_writes(enabled: bool) -> None:
+        """Route reads of the current request to the primary"""
+        _read_your_writes.set(enabled)
+
+    @staticmethod
+    def read_connection() -> BaseDBAsyncClient:
+        """Replica for plain reads, primary inside transactions, for read-your-writes requests or without replica"""
+        primary = connections.get(DbLayer.PRIMARY_CONNECTION)
+        if DbLayer.replica is None or isinstance(primary, BaseTransactionWrapper) or _read_your_writes.get():
+            return primary
+        return DbLayer.replica
+
     @staticmethod
     async def extract_relatable_fields(model: AbstractBaseModel) -> List[str]:
-        return [field for field, sheme in model._meta.fields_map.items() if
-                sheme.__class__.__base__ == RelationalField]
+        return list(get_metadata(model).prefetch)
 
     @staticmethod
     async def contains_by_id(model: Type[AbstractBaseModel], _id: int) -> bool:
@@ -120,9 +141,22 @@ class DbLayer(SystemUserDbLayer):
         """
         return await model.exists(**kwargs)
 
+    @staticmethod
+    async def project(query: QuerySet, model: Type[AbstractBaseModel],
+                      columns: Optional[Sequence[Union[Field, str]]] = None) -> QuerySet:
+        """
+        Full entity with every relation prefetched when columns is None,
+        otherwise only the given columns are selected and no relation is touched.
+        """
+        if columns is None:
+            return query.prefetch_related(*get_metadata(model).prefetch)
+        return query.only(*(col if isinstance(col, str) else col.model_field_name for col in columns))
+
     @staticmethod
     async def get_optional_view(model: Type[AbstractBaseModel], _id: Union[int, List[int]],
-                                columns: List[Field] = None) -> Union[AbstractBaseModel, List[AbstractBaseModel], None]:
+                                columns: Sequence[Union[Field, str]] = None) -> Union[AbstractBaseModel,
+                                                                                      List[AbstractBaseModel],
+                                                                                      None]:
         # TODO: Add docks
         """
         :param
@@ -135,12 +169,4 @@ class DbLayer(SystemUserDbLayer):
             query: QuerySet = model.filter(Q(id__in=_id))
         else:
             query: QuerySetSingle = model.get_or_none(id=_id)
-        if columns is None:
-            related = await DbLayer.extract_relatable_fields(model)
-            return await query.prefetch_related(*related)
-        else:
-            cols: List[str] = [col.model_field_name for col in columns]
-            rows = await query.values(*cols)
-            if isinstance(rows, list):
-                return [model(**row) for row in rows]
-            return model(**rows)
+        return await DbLayer.project(query, model, columns)
@@ -0,0 +1,38 @@
+from typing import Type
+from tortoise import Tortoise
+from tortoise.fields.relational import RelationalField
+from tortoise.models import Model
+
+
+class ModelMetadata:
+    """
+    Описание связей модели, собранное один раз по Model._meta.
+    prefetch - связи, которые подгружаются при чтении сущности целиком.
+    """
+    __slots__ = ("columns", "fk_fields", "m2m_fields", "backward_fields", "prefetch")
+
+    def __init__(self, model: Type[Model]):
+        meta = model._meta
+        self.columns = frozenset(meta.fields_db_projection)
+        self.fk_fields = frozenset(meta.fk_fields | meta.o2o_fields)
+        self.m2m_fields = frozenset(meta.m2m_fields)
+        self.backward_fields = frozenset(meta.backward_fk_fields)
+        self.prefetch = tuple(field for field, sheme in meta.fields_map.items()
+                              if sheme.__class__.__base__ == RelationalField)
+
+
+_metadata: dict[Type[Model], ModelMetadata] = {}
+
+
+def get_metadata(model: Type[Model]) -> ModelMetadata:
+    metadata = _metadata.get(model)
+    if metadata is None:
+        metadata = _metadata[model] = ModelMetadata(model)
+    return metadata
+
+
+def build_metadata() -> None:
+    """Собирает описание всех зарегистрированных моделей, вызывается после инициализации Tortoise"""
+    for models in Tortoise.apps.values():
+        for model in models.values():
+            get_metadata(model)
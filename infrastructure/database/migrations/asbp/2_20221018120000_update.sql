@@ -0,0 +1,5 @@
+-- upgrade --
+ALTER TABLE "systemusersession" ADD "scopes_mask" BIGINT NOT NULL  DEFAULT 0;
+COMMENT ON COLUMN "systemusersession"."scopes_mask" IS 'Битовая маска ролей, бит N - роль с id=N';
+-- downgrade --
+ALTER TABLE "systemusersession" DROP COLUMN "scopes_mask";
@@ -0,0 +1,7 @@
+-- upgrade --
+ALTER TABLE "plugin" ADD "entrypoint" VARCHAR(255);
+CREATE INDEX "idx_plugin_entrypo_0ad5a5" ON "plugin" ("entrypoint");
+COMMENT ON COLUMN "plugin"."entrypoint" IS 'Имя метода сервиса, к которому подключается плагин';
+-- downgrade --
+DROP INDEX "idx_plugin_entrypo_0ad5a5";
+ALTER TABLE "plugin" DROP COLUMN "entrypoint";
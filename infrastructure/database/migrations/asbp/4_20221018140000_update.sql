@@ -0,0 +1,12 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "outboxevent" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(64) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+COMMENT ON COLUMN "outboxevent"."name" IS 'Тип события';
+COMMENT ON COLUMN "outboxevent"."payload" IS 'Данные события';
+COMMENT ON TABLE "outboxevent" IS 'Событие, записанное в одной транзакции с изменением данных и ожидающее отправки';
+-- downgrade --
+DROP TABLE IF EXISTS "outboxevent";
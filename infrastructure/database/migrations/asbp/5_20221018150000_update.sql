@@ -0,0 +1,16 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "parkingreservation" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "start" TIMESTAMPTZ NOT NULL,
+    "end" TIMESTAMPTZ NOT NULL,
+    "parking_place_id" INT NOT NULL REFERENCES "parkingplace" ("id") ON DELETE CASCADE,
+    "transport_id" INT REFERENCES "transport" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_parkingrese_parking_7a1c3e" ON "parkingreservation" ("parking_place_id", "end");
+COMMENT ON COLUMN "parkingreservation"."start" IS 'Начало брони';
+COMMENT ON COLUMN "parkingreservation"."end" IS 'Конец брони';
+COMMENT ON TABLE "parkingreservation" IS 'Бронь парковочного места на интервал времени';
+-- downgrade --
+DROP TABLE IF EXISTS "parkingreservation";
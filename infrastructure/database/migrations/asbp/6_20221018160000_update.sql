@@ -0,0 +1,24 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "visitorimport" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "filename" VARCHAR(255) NOT NULL,
+    "file_format" VARCHAR(8) NOT NULL,
+    "status" VARCHAR(16) NOT NULL  DEFAULT 'pending',
+    "processed" INT NOT NULL  DEFAULT 0,
+    "imported" INT NOT NULL  DEFAULT 0,
+    "failed" INT NOT NULL  DEFAULT 0,
+    "error" TEXT,
+    "claim_id" INT REFERENCES "claim" ("id") ON DELETE SET NULL
+);
+COMMENT ON COLUMN "visitorimport"."filename" IS 'Имя загруженного файла';
+COMMENT ON COLUMN "visitorimport"."file_format" IS 'Формат файла (csv/xlsx)';
+COMMENT ON COLUMN "visitorimport"."status" IS 'pending/running/done/failed';
+COMMENT ON COLUMN "visitorimport"."processed" IS 'Обработано строк';
+COMMENT ON COLUMN "visitorimport"."imported" IS 'Создано посетителей';
+COMMENT ON COLUMN "visitorimport"."failed" IS 'Строк с ошибками';
+COMMENT ON COLUMN "visitorimport"."error" IS 'Причина, по которой импорт прерван';
+COMMENT ON TABLE "visitorimport" IS 'Импорт списка посетителей из файла, выполняется в фоне';
+-- downgrade --
+DROP TABLE IF EXISTS "visitorimport";
@@ -0,0 +1,4 @@
+-- upgrade --
+CREATE INDEX IF NOT EXISTS "idx_visitsessio_open_5b8e2d" ON "visitsession" ("visitor_id") WHERE "enter" IS NOT NULL AND "exit" IS NULL;
+-- downgrade --
+DROP INDEX IF EXISTS "idx_visitsessio_open_5b8e2d";
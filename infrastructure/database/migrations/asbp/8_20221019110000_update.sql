@@ -0,0 +1,11 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "stateversion" (
+    "name" VARCHAR(32) NOT NULL PRIMARY KEY,
+    "version" BIGINT NOT NULL  DEFAULT 0
+);
+COMMENT ON COLUMN "stateversion"."name" IS 'Имя состояния';
+COMMENT ON COLUMN "stateversion"."version" IS 'Номер изменения';
+COMMENT ON TABLE "stateversion" IS 'Версия состояния, которое воркеры держат в памяти, увеличивается в транзакции, изменившей состояние';
+INSERT INTO "stateversion" ("name", "version") VALUES ('auth', 0), ('roles', 0), ('blacklist', 0) ON CONFLICT DO NOTHING;
+-- downgrade --
+DROP TABLE IF EXISTS "stateversion";
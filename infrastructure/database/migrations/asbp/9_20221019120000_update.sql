@@ -0,0 +1,5 @@
+-- upgrade --
+ALTER TABLE "outboxevent" ADD "locked_until" TIMESTAMPTZ;
+COMMENT ON COLUMN "outboxevent"."locked_until" IS 'Событие отправляется релеем до этого момента';
+-- downgrade --
+ALTER TABLE "outboxevent" DROP COLUMN "locked_until";
@@ -1,37 +1,52 @@
 import re
-from datetime import datetime
-from tortoise import fields
+from typing import Iterable, Union
+from tortoise import fields, BaseDBAsyncClient
 from tortoise.models import Model
 from tortoise.validators import RegexValidator
 
 import settings
+from infrastructure.database.serializers import get_serializer
 
 
 class AbstractBaseModel(Model):
     """Базовая модель"""
     id = fields.IntField(pk=True)
 
-    async def values_dict(self, m2m_fields: bool = False, fk_fields: bool = False, drop_cols: list[str] = None) -> dict:
-        t_d = {}
-        for k, v in self.__dict__.items():
-            if k == "alteration_info_id":
-                continue
-            if isinstance(v, datetime):
-                v = v.astimezone().strftime("%d.%m.%Y, %H:%M:%S %z")
-            if not k.startswith('_'):
-                t_d.update({k: v})
-        if fk_fields:
-            for field in self._meta.fk_fields:
-                model = await getattr(self, field)
-                if model and not isinstance(model, AlterationInfo):
-                    t_d.update({field: await model.values_dict()})
-        if m2m_fields:
-            for field in self._meta.m2m_fields:
-                t_d.update({field: [await i.values_dict() for i in await getattr(self, field) if i]})
+    async def values_dict(self, m2m_fields: Union[bool, Iterable[str]] = False,
+                          fk_fields: Union[bool, Iterable[str]] = False, drop_cols: list[str] = None) -> dict:
+        return (await self.bulk_values_dict([self], m2m_fields=m2m_fields, fk_fields=fk_fields,
+                                            drop_cols=drop_cols))[0]
+
+    @classmethod
+    async def bulk_values_dict(cls, models: list["AbstractBaseModel"],
+                               m2m_fields: Union[bool, Iterable[str]] = False,
+                               fk_fields: Union[bool, Iterable[str]] = False,
+                               drop_cols: list[str] = None,
+                               using_db: BaseDBAsyncClient = None) -> list[dict]:
+        """
+        values_dict for a list of models of this class.
+        Relations not loaded yet are fetched with one IN query per relation for the whole list.
+        fk_fields/m2m_fields are either True for all relations of the kind or names of relations to load.
+        """
+        fk_fields = cls._meta.fk_fields if fk_fields is True else (fk_fields or ())
+        m2m_fields = cls._meta.m2m_fields if m2m_fields is True else (m2m_fields or ())
+        not_loaded = [field for field in fk_fields if any(f"_{field}" not in model.__dict__ for model in models)]
+        not_loaded += [field for field in m2m_fields if any(not getattr(model, field)._fetched for model in models)]
+        if models and not_loaded:
+            await cls.fetch_for_list(models, *not_loaded, using_db=using_db)
+        return [model._loaded_values_dict(m2m_fields, fk_fields, drop_cols) for model in models]
+
+    def _loaded_values_dict(self, m2m_fields: Iterable[str], fk_fields: Iterable[str], drop_cols: list[str]) -> dict:
+        t_d = get_serializer(type(self)).serialize(self)
+        for field in fk_fields:
+            model = self.__dict__.get(f"_{field}")
+            if model and not isinstance(model, AlterationInfo):
+                t_d[field] = model._loaded_values_dict((), (), None)
+        for field in m2m_fields:
+            t_d[field] = [i._loaded_values_dict((), (), None) for i in getattr(self, field) if i]
         if drop_cols:
             for drops in drop_cols:
-                if drops in t_d:
-                    t_d.pop(drops)
+                t_d.pop(drops, None)
         return t_d
 
     class Meta:
@@ -92,6 +107,7 @@ class SystemUserSession(AbstractBaseModel):
     salt = fields.TextField()
     nonce = fields.TextField()
     tag = fields.TextField()
+    scopes_mask = fields.BigIntField(default=0, description='Битовая маска ролей, бит N - роль с id=N')
 
 
 class Role(AbstractBaseModel, TimestampMixin):
@@ -321,6 +337,7 @@ class ParkingPlace(AbstractBaseModel, TimestampMixin):
 
     parking: fields.ReverseRelation["Parking"]
     transports: fields.ReverseRelation["Transport"]
+    reservations: fields.ReverseRelation["ParkingReservation"]
 
 
 class Parking(AbstractBaseModel, TimestampMixin):
@@ -357,6 +374,21 @@ class ParkingTimeSlot(AbstractBaseModel, TimestampMixin):
     acquire_parking_intervals: fields.ReverseRelation["AcquireParkingInterval"]
 
 
+class ParkingReservation(AbstractBaseModel, TimestampMixin):
+    """Бронь парковочного места на интервал времени"""
+    parking_place: fields.ForeignKeyRelation["ParkingPlace"] = fields.ForeignKeyField(
+        'asbp.ParkingPlace', on_delete=fields.CASCADE, related_name='reservations'
+    )
+    start = fields.DatetimeField(description='Начало брони')
+    end = fields.DatetimeField(description='Конец брони')
+    transport: fields.ForeignKeyNullableRelation["Transport"] = fields.ForeignKeyField(
+        'asbp.Transport', on_delete=fields.CASCADE, related_name='parking_reservations', null=True
+    )
+
+    class Meta:
+        indexes = (("parking_place", "end"),)
+
+
 # ------------------------------------SYSTEM---------------------------------
 
 class BlackList(AbstractBaseModel, TimestampMixin):
@@ -371,6 +403,36 @@ class Plugin(AbstractBaseModel):
     filename = fields.CharField(max_length=255)
     name = fields.CharField(max_length=255)
     enabled = fields.BooleanField(default=False)
+    entrypoint = fields.CharField(max_length=255, null=True, index=True,
+                                  description='Имя метода сервиса, к которому подключается плагин')
+
+
+class VisitorImport(AbstractBaseModel, TimestampMixin):
+    """Импорт списка посетителей из файла, выполняется в фоне"""
+    filename = fields.CharField(max_length=255, description='Имя загруженного файла')
+    file_format = fields.CharField(max_length=8, description='Формат файла (csv/xlsx)')
+    status = fields.CharField(max_length=16, default='pending', description='pending/running/done/failed')
+    claim: fields.ForeignKeyNullableRelation["Claim"] = fields.ForeignKeyField(
+        'asbp.Claim', on_delete=fields.SET_NULL, related_name='visitor_imports', null=True
+    )
+    processed = fields.IntField(default=0, description='Обработано строк')
+    imported = fields.IntField(default=0, description='Создано посетителей')
+    failed = fields.IntField(default=0, description='Строк с ошибками')
+    error = fields.TextField(null=True, description='Причина, по которой импорт прерван')
+
+
+class OutboxEvent(AbstractBaseModel):
+    """Событие, записанное в одной транзакции с изменением данных и ожидающее отправки"""
+    name = fields.CharField(max_length=64, description='Тип события')
+    payload = fields.JSONField(description='Данные события')
+    created_at = fields.DatetimeField(auto_now_add=True)
+    locked_until = fields.DatetimeField(null=True, description='Событие отправляется релеем до этого момента')
+
+
+class StateVersion(Model):
+    """Версия состояния, которое воркеры держат в памяти, увеличивается в транзакции, изменившей состояние"""
+    name = fields.CharField(pk=True, max_length=32, description='Имя состояния')
+    version = fields.BigIntField(default=0, description='Номер изменения')
 
 
 class AlterationInfo:
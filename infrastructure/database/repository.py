@@ -69,3 +69,22 @@ class EntityRepository:
             raise InconsistencyError(message=f"Such {target_model.__name__} does not exist")
         if entity.deleted:
             raise InconsistencyError(message=f"This {target_model.__name__} is already marked as deleted")
+
+    @staticmethod
+    async def allocate_ids(target_model: Type[AbstractBaseModel], count: int) -> List[EntityId]:
+        """
+        Primary keys for count new rows, so bulk_create can insert rows that reference each other.
+        Must be called in the transaction that inserts the rows.
+        """
+        if count <= 0:
+            return []
+        db = target_model._meta.db
+        table = target_model._meta.db_table
+        if db.capabilities.dialect == "postgres":
+            rows = await db.execute_query_dict(
+                f"SELECT nextval(pg_get_serial_sequence('\"{table}\"', 'id')) AS id FROM generate_series(1, $1)",
+                [count])
+            return [row["id"] for row in rows]
+        # other backends serialize write transactions, the ids after the maximum stay free until commit
+        rows = await db.execute_query_dict(f'SELECT COALESCE(MAX("id"), 0) AS id FROM "{table}"')
+        return list(range(rows[0]["id"] + 1, rows[0]["id"] + 1 + count))
@@ -0,0 +1,49 @@
+from typing import Optional, Type
+from tortoise import Tortoise, fields
+from tortoise.models import Model
+
+DATETIME_FORMAT = "%d.%m.%Y, %H:%M:%S %z"
+SKIPPED_COLUMNS = frozenset({"alteration_info_id"})
+
+
+class ModelSerializer:
+    """
+    Сериализатор модели, собранный один раз по Model._meta.
+    Знает заранее, какие колонки отдавать и какие из них нужно форматировать как дату.
+    """
+    __slots__ = ("columns", "datetime_columns")
+
+    def __init__(self, model: Type[Model]):
+        meta = model._meta
+        self.columns = tuple(name for name in meta.fields_db_projection if name not in SKIPPED_COLUMNS)
+        self.datetime_columns = tuple(name for name in self.columns
+                                      if isinstance(meta.fields_map[name], fields.DatetimeField))
+
+    def serialize(self, instance: Model, drop_cols: Optional[list[str]] = None) -> dict:
+        values = instance.__dict__
+        result = {name: values[name] for name in self.columns if name in values}
+        for name in self.datetime_columns:
+            value = result.get(name)
+            if value is not None:
+                result[name] = value.astimezone().strftime(DATETIME_FORMAT)
+        if drop_cols:
+            for name in drop_cols:
+                result.pop(name, None)
+        return result
+
+
+_serializers: dict[Type[Model], ModelSerializer] = {}
+
+
+def get_serializer(model: Type[Model]) -> ModelSerializer:
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = ModelSerializer(model)
+    return serializer
+
+
+def compile_serializers() -> None:
+    """Собирает сериализаторы всех зарегистрированных моделей, вызывается после инициализации Tortoise"""
+    for models in Tortoise.apps.values():
+        for model in models.values():
+            get_serializer(model)
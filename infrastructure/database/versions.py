@@ -0,0 +1,43 @@
+import time
+from typing import Optional
+
+from tortoise.expressions import F
+
+from infrastructure.database.models import StateVersion
+
+
+class VersionStamp:
+    """
+    Version row of a state every worker keeps in memory. bump() runs in the transaction that changes the state,
+    so the new version is visible exactly when the change is. changed() compares the row with the version
+    the worker saw last, at most once per max_age seconds, and tells the worker to drop its copy.
+    """
+
+    def __init__(self, name: str, max_age: float):
+        self.name = name
+        self.max_age = max_age
+        self._seen: Optional[int] = None
+        self._checked_at: Optional[float] = None
+
+    async def _read(self) -> int:
+        self._checked_at = time.monotonic()
+        return await StateVersion.filter(name=self.name).first().values_list("version", flat=True) or 0
+
+    async def bump(self) -> None:
+        if not await StateVersion.filter(name=self.name).update(version=F("version") + 1):
+            await StateVersion.create(name=self.name, version=1)
+
+    async def sync(self) -> None:
+        """Remember the current version, call before loading the state"""
+        self._seen = await self._read()
+
+    async def changed(self) -> bool:
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.max_age:
+            return False
+        version = await self._read()
+        changed, self._seen = version != self._seen, version
+        return changed
+
+    def expire(self) -> None:
+        """Read the row on the next changed(), after this worker changed the state"""
+        self._checked_at = None
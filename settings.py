@@ -15,6 +15,9 @@ DB_PASSWORD = env.str('POSTGRES_PASSWORD', default='postgres')
 DB_HOST = env.str('POSTGRES_HOST', default='localhost')
 DB_PORT = env.int('POSTGRES_PORT', default=5432)
 DB_NAME = env.str('POSTGRES_DB')
+# Read replica for non-transactional reads, reads go to the primary when it is not set
+DB_REPLICA_HOST = env.str('POSTGRES_REPLICA_HOST', default=None)
+DB_REPLICA_PORT = env.int('POSTGRES_REPLICA_PORT', default=DB_PORT)
 
 # Sanic server
 DEBUG = env.bool('DEBUG', default=False)
@@ -23,21 +26,105 @@ PORT = env.int('PORT', default=8000)
 FAST = env.bool('FAST', default=True)
 WORKERS = env.int('WORKERS', default=2)
 
+# Postgres connection pool, every Sanic worker has its own pool of DB_POOL_MAXSIZE connections
+DB_MAX_CONNECTIONS = env.int('POSTGRES_MAX_CONNECTIONS', default=20)
+DB_POOL_MINSIZE = env.int('DB_POOL_MINSIZE', default=1)
+DB_POOL_MAXSIZE = env.int('DB_POOL_MAXSIZE', default=max(2, DB_MAX_CONNECTIONS // WORKERS))
+DB_STATEMENT_CACHE_SIZE = env.int('DB_STATEMENT_CACHE_SIZE', default=1024)
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = env.float('DB_MAX_INACTIVE_CONNECTION_LIFETIME', default=300.0)
+DB_POOL_ACQUIRE_TIMEOUT = env.float('DB_POOL_ACQUIRE_TIMEOUT', default=10.0)
+# Requests with this header set to 1 read from the primary to see their own writes
+READ_YOUR_WRITES_HEADER = 'X-Read-Your-Writes'
+
 # Email
 MAIL_SERVER_HOST = env.str('MAIL_SERVER_HOST')
 MAIL_SERVER_PORT = env.int('MAIL_SERVER_PORT')
 MAIL_SERVER_USER = env.str('MAIL_SERVER_USER')
 MAIL_SERVER_PASSWORD = env.str('MAIL_SERVER_PASSWORD')
+# SMTP connections are kept open between tasks of a Celery worker process
+MAIL_POOL_SIZE = env.int('MAIL_POOL_SIZE', default=4)
+MAIL_POOL_IDLE_TIMEOUT = env.float('MAIL_POOL_IDLE_TIMEOUT', default=60.0)
+MAIL_MAX_MESSAGES_PER_CONNECTION = env.int('MAIL_MAX_MESSAGES_PER_CONNECTION', default=100)
+MAIL_MAX_RECIPIENTS = env.int('MAIL_MAX_RECIPIENTS', default=50)
+# Every Sanic worker relays committed outbox events to the broker, events of one batch are sent as one Celery task
+OUTBOX_BATCH_SIZE = env.int('OUTBOX_BATCH_SIZE', default=500)
+OUTBOX_POLL_INTERVAL = env.float('OUTBOX_POLL_INTERVAL', default=0.5)
+# A relay claims a batch for this many seconds, a batch of a relay that died is sent again after the lease
+OUTBOX_LEASE = env.float('OUTBOX_LEASE', default=60.0)
+# On shutdown the relay finishes the batch in flight for up to this many seconds
+OUTBOX_DRAIN_TIMEOUT = env.float('OUTBOX_DRAIN_TIMEOUT', default=5.0)
+
+# In-memory state shared by workers is checked against its version row at most every MAX_AGE seconds
+SHARED_STATE_MAX_AGE = env.float('SHARED_STATE_MAX_AGE', default=1.0)
 
 # Sanic config
 FORWARDED_SECRET = env.str('FORWARDED_SECRET')
 
+# Auth
+# Verified sessions are cached per worker for TTL seconds, logouts and user changes reach other workers
+# within SHARED_STATE_MAX_AGE seconds
+AUTH_SESSION_CACHE_SIZE = env.int('AUTH_SESSION_CACHE_SIZE', default=10000)
+AUTH_SESSION_CACHE_TTL = env.int('AUTH_SESSION_CACHE_TTL', default=60)
+# "hkdf" derives the token master key once per process, "scrypt" derives a key per token (legacy)
+TOKEN_CRYPTO_MODE = env.str('TOKEN_CRYPTO_MODE', default='hkdf')
+TOKEN_KEY_ID = env.int('TOKEN_KEY_ID', default=1)
+TOKEN_RETIRED_KEY_IDS = env.list('TOKEN_RETIRED_KEY_IDS', subcast=int, default=[])
+TOKEN_KDF_SALT = env.str('TOKEN_KDF_SALT', default='asbp-token-master-key')
+
+# Crypto executor ("thread" or "process"), requests beyond workers + queue get 429
+CRYPTO_EXECUTOR_KIND = env.str('CRYPTO_EXECUTOR_KIND', default='thread')
+CRYPTO_EXECUTOR_WORKERS = env.int('CRYPTO_EXECUTOR_WORKERS', default=2)
+CRYPTO_EXECUTOR_MAX_QUEUE = env.int('CRYPTO_EXECUTOR_MAX_QUEUE', default=64)
+
+# Plugins, files are looked up in PLUGINS_DIRNAME relative to the working directory
+PLUGINS_DIRNAME = env.str('PLUGINS_DIRNAME', default='plugins')
+PLUGINS_REFRESH_INTERVAL = env.float('PLUGINS_REFRESH_INTERVAL', default=30.0)
+# Defaults for plugin hooks, a plugin module can override them with TIMEOUT and BACKGROUND attributes
+PLUGINS_TIMEOUT = env.float('PLUGINS_TIMEOUT', default=5.0)
+PLUGINS_AFTER_IN_BACKGROUND = env.bool('PLUGINS_AFTER_IN_BACKGROUND', default=False)
+PLUGINS_EXECUTOR_WORKERS = env.int('PLUGINS_EXECUTOR_WORKERS', default=4)
+
+# Blacklist index is kept in memory by every worker, reloaded within SHARED_STATE_MAX_AGE seconds of a blacklist
+# change and fully reloaded every REFRESH_INTERVAL seconds to pick up changed visitor documents
+BLACKLIST_INDEX_REFRESH_INTERVAL = env.float('BLACKLIST_INDEX_REFRESH_INTERVAL', default=60.0)
+
+# Turnstile access decisions. Readers send one of DEVICE_KEYS in the DEVICE_KEY_HEADER header.
+# Passes changed by the worker are reread after commit, all passes every RELOAD_INTERVAL seconds
+DEVICE_KEYS = env.list('DEVICE_KEYS', default=[])
+DEVICE_KEY_HEADER = env.str('DEVICE_KEY_HEADER', default='X-Device-Key')
+PASS_INDEX_RELOAD_INTERVAL = env.float('PASS_INDEX_RELOAD_INTERVAL', default=60.0)
+
+# Occupancy (open visit sessions) is kept in memory by every worker, a read reloads it when it is older than MAX_AGE
+# seconds, so headcounts of different workers differ by at most MAX_AGE seconds
+OCCUPANCY_MAX_AGE = env.float('OCCUPANCY_MAX_AGE', default=1.0)
+
+# Parking reservations are kept in memory by every worker and fully reloaded every RELOAD_INTERVAL seconds.
+# A group reservation picks other free places at most RESERVE_ATTEMPTS times if the picked ones were taken
+PARKING_INDEX_RELOAD_INTERVAL = env.float('PARKING_INDEX_RELOAD_INTERVAL', default=60.0)
+PARKING_RESERVE_ATTEMPTS = env.int('PARKING_RESERVE_ATTEMPTS', default=3)
+
+# Bulk visitor creation, rows per request
+VISITOR_BULK_MAX_ROWS = env.int('VISITOR_BULK_MAX_ROWS', default=500)
+# Visitor list imports, uploads and error files are kept in DIRNAME relative to the working directory
+VISITOR_IMPORT_DIRNAME = env.str('VISITOR_IMPORT_DIRNAME', default='imports')
+VISITOR_IMPORT_CHUNK_SIZE = env.int('VISITOR_IMPORT_CHUNK_SIZE', default=500)
+VISITOR_IMPORT_CONCURRENCY = env.int('VISITOR_IMPORT_CONCURRENCY', default=1)
+VISITOR_IMPORT_MAX_SIZE = env.int('VISITOR_IMPORT_MAX_SIZE', default=50 * 1024 * 1024)
+# Error files of finished imports are removed after this many seconds
+VISITOR_IMPORT_ERRORS_MAX_AGE = env.float('VISITOR_IMPORT_ERRORS_MAX_AGE', default=7 * 24 * 3600)
+
+# Exports are read and streamed EXPORT_CHUNK_SIZE rows at a time
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=1000)
+
 # Apps models
 APPS_MODELS = [
     "infrastructure.database.models",
     "aerich.models",
 ]
 
+# Pagination, list routes never return more rows than this
+PAGE_MAX_SIZE = env.int('PAGE_MAX_SIZE', default=1000)
+
 # Time format
 ACCESS_DATETIME_FORMAT = '%d.%m.%Y %H:%M:%S'
 ACCESS_DATE_FORMAT = '%d.%m.%Y'
@@ -62,6 +149,11 @@ CELERY_STARTUP_PARAMS = ['-A',
 PHONE_NUMBER = r'^(\+7|7|8)?[\s\-]?\(?[489][0-9]{2}\)?[\s\-]?[0-9]{3}[\s\-]?[0-9]{2}[\s\-]?[0-9]{2}$'
 
 # Mailing list
+# Blacklist notifications go to members of this role
+SECURITY_OFFICER_ROLE = env.str('SECURITY_OFFICER_ROLE', default='security_officer')
+# Recipient lists are cached per worker, changes made by other workers are seen after TTL seconds
+RECIPIENTS_CACHE_SIZE = env.int('RECIPIENTS_CACHE_SIZE', default=1024)
+RECIPIENTS_CACHE_TTL = env.int('RECIPIENTS_CACHE_TTL', default=60)
 CLAIMWAY_SUBJECT_TEXT = "Вам пришло новое письмо для подтверждения пропуска!"
 CLAIMWAY_BODY_TEXT = "Simple text for test"
 
@@ -1,6 +1,24 @@
-import pytest
+from base64 import urlsafe_b64encode
+from datetime import datetime
+from types import ModuleType, SimpleNamespace
 
+import pytest
+from tortoise.transactions import in_transaction
+
+from application.service.exports import EXPORTS, csv_header, csv_rows, to_ndjson
+from application.service.occupancy import Occupancy
+from application.service.parking import PlaceSchedule
+from application.service.pass_index import PassAccess, PassAccessIndex
+from application.service.visitor_import import next_chunk, parse_rows, read_csv, read_xlsx, resolve_rows
+from core.communication.celery.aggregator import aggregate_notifications
+from core.errors.dto_error import DtoValidationError
+from core.plugins.plugins_wrap import AddPlugins
+from core.plugins.registry import plugin_registry
 from core.server.server import Server
+from core.utils.crypto import AESCrypto
+from core.utils.pagination import Cursor, PageParams
+from infrastructure.database.models import Visitor
+from infrastructure.database.repository import EntityRepository
 
 
 app = Server('test_app').sanic_app
@@ -27,6 +45,52 @@ class TestAuthentication:
         assert request.method.lower() == "post"
         assert resp.status == 401
 
+    async def test_logout_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.delete("/auth")
+        assert request.method.lower() == "delete"
+        assert resp.status == 401
+
+
+def _issue_token(crypto: AESCrypto, payload: str) -> dict:
+    """Token as the client gets it and salt, nonce and tag as the session stores them"""
+    token = crypto.encrypt(payload)
+    token.encode()
+    return {"cipher_text": token.cipher_text, "salt": token.salt, "nonce": token.nonce, "tag": token.tag}
+
+
+def _validate_token(crypto: AESCrypto, token: dict) -> bytes:
+    return crypto.decrypt(AESCrypto.DataStruct(token["cipher_text"], token["salt"], token["nonce"], token["tag"]))
+
+
+class TestToken:
+    secret = "token-test-secret"
+
+    async def test_keyed_token_round_trip(self):
+        crypto = AESCrypto(self.secret, key_id=1, master_salt="salt")
+        token = _issue_token(crypto, '{"user": 1}')
+        assert token["cipher_text"].startswith("v2.1.")
+        assert token["salt"] == ""
+        assert _validate_token(crypto, token) == b'{"user": 1}'
+
+    async def test_legacy_token_is_accepted(self):
+        token = _issue_token(AESCrypto(self.secret), '{"user": 1}')
+        assert not token["cipher_text"].startswith(AESCrypto.TOKEN_PREFIX)
+        assert _validate_token(AESCrypto(self.secret, key_id=1, master_salt="salt"), token) == b'{"user": 1}'
+
+    async def test_key_rotation(self):
+        token = _issue_token(AESCrypto(self.secret, key_id=1, master_salt="salt"), '{"user": 1}')
+        rotated = AESCrypto(self.secret, key_id=2, retired_key_ids=[1], master_salt="salt")
+        assert _validate_token(rotated, token) == b'{"user": 1}'
+        with pytest.raises(ValueError):
+            _validate_token(AESCrypto(self.secret, key_id=2, master_salt="salt"), token)
+
+    async def test_key_id_is_authenticated(self):
+        crypto = AESCrypto(self.secret, key_id=2, retired_key_ids=[1], master_salt="salt")
+        token = _issue_token(crypto, '{"user": 1}')
+        token["cipher_text"] = "v2.1." + token["cipher_text"][len("v2.2."):]
+        with pytest.raises(ValueError):
+            _validate_token(crypto, token)
+
 
 class TestSystemUser:
 
@@ -61,11 +125,118 @@ class TestVisitor:
         assert request.method.lower() == "get"
         assert resp.status == 200
 
+    async def test_bulk_create_visitors_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.post('/visitors/bulk',
+                                                   json={"visitors": [{"first_name": "a", "last_name": "b"}]})
+        assert request.method.lower() == "post"
+        assert resp.status == 401
+
+    async def test_import_visitors_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.post('/visitors/import', params={"format": "csv"},
+                                                   content="first_name,last_name\na,b\n")
+        assert request.method.lower() == "post"
+        assert resp.status == 401
+
     async def test_visitors_get_by_id_returns_200(self):
         request, resp = await app.asgi_client.get('/visitors/1')
         assert request.method.lower() == "get"
         assert resp.status == 200
 
+    async def test_get_visitors_with_cursor_returns_200(self):
+        request, resp = await app.asgi_client.get('/visitors?cursor=&limit=10')
+        assert request.method.lower() == "get"
+        assert resp.status == 200
+        assert "next_cursor" in resp.json
+
+    async def test_get_visitors_with_fields_returns_200(self):
+        request, resp = await app.asgi_client.get('/visitors?fields=first_name,last_name')
+        assert request.method.lower() == "get"
+        assert resp.status == 200
+        assert all(set(item) <= {"id", "first_name", "last_name"} for item in resp.json)
+
+
+class TestVisitorBulk:
+
+    async def test_overlong_values_fail_only_their_row(self):
+        valid, long_name, long_gender, long_military_id = parse_rows([
+            (0, {"first_name": "Ivan", "last_name": "Petrov", "middle_name": "I" * 24}),
+            (1, {"first_name": "Ivan", "last_name": "Petrov", "middle_name": "I" * 25}),
+            (2, {"first_name": "Ivan", "last_name": "Petrov", "passport": {"number": 1, "gender": "g" * 9}}),
+            (3, {"first_name": "Ivan", "last_name": "Petrov", "military_id": {"number": "1" * 17}}),
+        ])
+        assert valid.errors == []
+        assert [error.split(":")[0] for error in long_name.errors] == ["middle_name"]
+        assert [error.split(":")[0] for error in long_gender.errors] == ["passport.gender"]
+        assert [error.split(":")[0] for error in long_military_id.errors] == ["military_id.number"]
+
+    async def test_resolve_rows_reports_documents_repeated_in_one_batch(self):
+        passport, drive_license = 987654321012, 987654321013
+        rows = parse_rows([
+            (0, {"first_name": "Ivan", "last_name": "Petrov", "passport": {"number": passport},
+                 "drive_license": {"number": drive_license}}),
+            (1, {"first_name": "Anna", "last_name": "Petrova", "passport": {"number": passport}}),
+            (2, {"first_name": "Oleg", "last_name": "Petrov", "drive_license": {"number": drive_license}}),
+        ])
+        await resolve_rows(rows)
+        assert rows[0].errors == []
+        assert rows[1].errors == [f"passport: number {passport} is already used in row 0"]
+        assert rows[2].errors == [f"drive_license: number {drive_license} is already used in row 0"]
+
+    async def test_allocate_ids_are_new_and_distinct(self):
+        async with in_transaction():
+            ids = await EntityRepository.allocate_ids(Visitor, 3)
+            assert len(set(ids)) == 3 and ids == sorted(ids)
+            assert not await Visitor.filter(id__in=ids).exists()
+        assert await EntityRepository.allocate_ids(Visitor, 0) == []
+
+
+class TestVisitorImport:
+
+    async def test_read_csv_detects_delimiter_and_nests_documents(self, tmp_path):
+        path = tmp_path / "visitors.csv"
+        path.write_text("\ufefffirst_name;last_name;passport.number;passport.date_of_birth\n"
+                        "Ivan; Petrov ;4510123456;01.02.1990\n"
+                        "Anna;Sidorova;;\n", encoding="utf-8")
+        assert list(read_csv(str(path))) == [
+            (2, {"first_name": "Ivan", "last_name": "Petrov",
+                 "passport": {"number": "4510123456", "date_of_birth": "01.02.1990"}}),
+            (3, {"first_name": "Anna", "last_name": "Sidorova"}),
+        ]
+
+    async def test_read_xlsx_formats_dates_and_skips_empty_rows(self, tmp_path):
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["first_name", "last_name", "passport.number", "passport.date_of_birth"])
+        sheet.append(["Ivan", "Petrov", 4510123456, datetime(1990, 2, 1)])
+        sheet.append([None, None, None, None])
+        sheet.append(["Anna", "Sidorova", None, None])
+        path = tmp_path / "visitors.xlsx"
+        workbook.save(path)
+        assert list(read_xlsx(str(path))) == [
+            (2, {"first_name": "Ivan", "last_name": "Petrov",
+                 "passport": {"number": 4510123456, "date_of_birth": "01.02.1990"}}),
+            (4, {"first_name": "Anna", "last_name": "Sidorova"}),
+        ]
+
+    async def test_next_chunk_validates_rows_one_by_one(self):
+        rows = iter([
+            (2, {"first_name": "Ivan", "last_name": "Petrov", "passport": {"number": "4510123456",
+                                                                           "date_of_birth": "01.02.1990"}}),
+            (3, {"first_name": "I" * 25, "last_name": "Petrov"}),
+            (4, {"first_name": "Anna", "last_name": "Sidorova", "passport": {"number": "4510654321",
+                                                                             "date_of_birth": "1990-02-01"}}),
+        ])
+        valid, too_long = next_chunk(rows, 2, claim=7)
+        assert valid.errors == [] and valid.claim == 7
+        assert valid.documents["passport"]["date_of_birth"] == datetime(1990, 2, 1)
+        assert too_long.item is None and too_long.errors[0].startswith("first_name: ")
+
+        [bad_date] = next_chunk(rows, 2, claim=7)
+        assert bad_date.index == 4
+        assert bad_date.errors == ["passport.date_of_birth: must be given in %d.%m.%Y format"]
+        assert next_chunk(rows, 2) == []
+
 
 class TestPassport:
 
@@ -157,6 +328,103 @@ class TestBlackList:
         assert request.method.lower() == "get"
         assert resp.status == 200
 
+    async def test_blacklist_screen_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.post('/blacklist/screen', json={"visitors": [{"passport": "1"}]})
+        assert request.method.lower() == "post"
+        assert resp.status == 401
+
+
+class TestAccessDecision:
+
+    async def test_access_decision_without_device_key_returns_401(self):
+        request, resp = await app.asgi_client.get('/access/decision', params={"rfid": 1, "zone": 1})
+        assert request.method.lower() == "get"
+        assert resp.status == 401
+
+    async def test_decide_reasons(self):
+        index = PassAccessIndex(reload_interval=0)
+        index._by_rfid = {1: PassAccess(10, True, 200.0, frozenset({5})),
+                          2: PassAccess(20, False, 200.0, frozenset({5})),
+                          3: PassAccess(30, True, 50.0, frozenset({5}))}
+        assert index.decide(1, 5, now=100.0) == (True, "allowed", 10)
+        assert index.decide(1, 6, now=100.0) == (False, "zone_denied", 10)
+        assert index.decide(2, 5, now=100.0) == (False, "invalid", 20)
+        assert index.decide(3, 5, now=100.0) == (False, "expired", 30)
+        assert index.decide(4, 5, now=100.0) == (False, "unknown_rfid", None)
+
+
+class TestOccupancy:
+
+    async def test_occupancy_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.get('/occupancy')
+        assert request.method.lower() == "get"
+        assert resp.status == 401
+
+    async def test_visitor_with_two_open_sessions_is_counted_once(self):
+        occupancy = Occupancy(max_age=1)
+        occupancy._add(1, 100, frozenset({5, 6}))
+        occupancy._add(2, 100, frozenset({5}))
+        occupancy._add(3, 200, frozenset({6}))
+        assert occupancy.snapshot() == {"count": 2, "zones": {5: 1, 6: 2}, "visitors": [100, 200]}
+
+        occupancy._remove(2)
+        assert occupancy.snapshot(5) == {"zone": 5, "count": 1, "visitors": [100]}
+        occupancy._remove(1)
+        occupancy._remove(1)
+        assert occupancy.snapshot() == {"count": 1, "zones": {6: 1}, "visitors": [200]}
+
+
+class TestParkingAvailability:
+
+    async def test_parking_availability_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.get('/parking/availability',
+                                                  params={"start": "01.01.2023 10:00:00", "end": "01.01.2023 12:00:00"})
+        assert request.method.lower() == "get"
+        assert resp.status == 401
+
+    async def test_place_schedule_overlaps(self):
+        place = PlaceSchedule(real_number=1, enable=True, legacy=(0.0, 10.0))
+        place.add((30.0, 40.0, 2))
+        place.add((20.0, 30.0, 1))
+        # intervals are half-open, touching reservations don't overlap
+        assert not place.overlaps(10.0, 20.0)
+        assert not place.overlaps(40.0, 50.0)
+        assert place.overlaps(5.0, 15.0)
+        assert place.overlaps(25.0, 26.0)
+        assert place.overlaps(15.0, 45.0)
+        assert place.overlaps(39.0, 41.0)
+
+        place.discard(1)
+        assert not place.overlaps(20.0, 30.0)
+
+
+class TestExport:
+
+    async def test_export_visit_sessions_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.get('/export/visitsessions', params={"format": "csv"})
+        assert request.method.lower() == "get"
+        assert resp.status == 401
+
+    async def test_export_chunk_encoding(self):
+        rows = [{"id": 1, "level": "high, permanent"}, {"id": 2, "level": None}]
+        assert to_ndjson(rows) == b'{"id":1,"level":"high, permanent"}\n{"id":2,"level":null}\n'
+        assert csv_rows(rows) == b'1,"high, permanent"\r\n2,\r\n'
+        assert csv_header(EXPORTS["blacklist"]) == b"id,visitor,first_name,last_name,middle_name,level\r\n"
+
+
+class TestNotifications:
+
+    async def test_alerts_with_one_subject_and_different_texts_are_all_sent(self):
+        payloads = [
+            {"subject": "Alert", "email": ["a@mail.ru", "b@mail.ru"], "text": ["Visitor 1", "Visitor 1"]},
+            {"subject": "Alert", "email": ["a@mail.ru", ""], "text": ["Visitor 2", "Visitor 2"]},
+            {"subject": "Alert", "email": ["b@mail.ru"], "text": ["Visitor 1"]},
+        ]
+        assert aggregate_notifications(payloads) == [
+            {"subject": "Alert", "text": "Visitor 1", "emails": ["a@mail.ru", "b@mail.ru"]},
+            {"subject": "Alert", "text": "Visitor 2", "emails": ["a@mail.ru"]},
+        ]
+
 
 class TestZone:
 
@@ -236,6 +504,71 @@ class TestRole:
         assert resp.status == 200
 
 
+class TestPlugins:
+
+    async def test_plugin_with_both_hooks_runs_before_and_after(self, monkeypatch):
+        calls = []
+        plugin = ModuleType("both_hooks")
+        plugin.BACKGROUND = False
+        plugin.before = lambda value: calls.append(("before", value))
+        plugin.after = lambda value, result: calls.append(("after", value, result))
+
+        async def get(entrypoint):
+            return [plugin] if entrypoint == "double" else []
+        monkeypatch.setattr(plugin_registry, "get", get)
+
+        @AddPlugins()
+        async def double(value):
+            calls.append(("call", value))
+            return value * 2
+
+        assert await double(2) == 4
+        assert calls == [("before", 2), ("call", 2), ("after", 2, 4)]
+
+
+class TestPagination:
+
+    async def test_cursor_round_trip(self):
+        cursor = Cursor.encode(42)
+        assert cursor.isascii() and "42" not in cursor
+        assert Cursor.decode(cursor) == 42
+
+    @pytest.mark.parametrize("cursor", [
+        "not a cursor",
+        Cursor.encode(42)[:-3],
+        urlsafe_b64encode(b'{"id": "42"}').decode(),
+        urlsafe_b64encode(b'{"offset": 42}').decode(),
+        urlsafe_b64encode(b"[42]").decode(),
+    ])
+    async def test_tampered_cursor_is_rejected(self, cursor):
+        with pytest.raises(DtoValidationError):
+            Cursor.decode(cursor)
+
+    async def test_keyset_pages_rows_with_equal_values_once(self):
+        # rows share last names, the keyset is the unique id, so pages never skip or repeat a row
+        rows = [SimpleNamespace(id=row_id, last_name="Petrov" if row_id % 2 else "Ivanov")
+                for row_id in (2, 3, 5, 7, 8, 11)]
+        seen, cursor = [], ""
+        for _ in range(len(rows)):
+            page = PageParams(3, after_id=Cursor.decode(cursor) if cursor else None, keyset=True)
+            fetched = [row for row in rows if page.after_id is None or row.id > page.after_id][:page.query_limit]
+            models, cursor = page.split(fetched)
+            seen.extend(row.id for row in models)
+            if cursor is None:
+                break
+        assert seen == [2, 3, 5, 7, 8, 11]
+        # the last page is full and there is no trailing empty page
+        assert models == rows[3:]
+
+
+class TestInternal:
+
+    async def test_metrics_without_cookies_returns_401(self):
+        request, resp = await app.asgi_client.get('/internal/metrics')
+        assert request.method.lower() == "get"
+        assert resp.status == 401
+
+
 async def test_incorrect_url_returns_404():
     request, resp = await app.asgi_client.get('/hello_world')
     assert request.method.lower() == "get"